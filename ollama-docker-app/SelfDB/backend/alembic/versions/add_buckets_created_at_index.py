@@ -0,0 +1,30 @@
+"""Add a (created_at, id) index for keyset pagination of buckets
+
+Revision ID: add_buckets_created_at_index
+Revises: create_indexes_after_seed
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_buckets_created_at_index'
+down_revision = 'create_indexes_after_seed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built concurrently, outside the migration transaction, so the buckets
+    # table stays writable while the index is created
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_buckets_created_at_id '
+            'ON buckets (created_at DESC, id DESC)'
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS ix_buckets_created_at_id')
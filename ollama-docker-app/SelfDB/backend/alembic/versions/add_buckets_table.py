@@ -35,12 +35,25 @@ def upgrade():
 
     # Add bucket_id column to files table
     op.add_column('files', sa.Column('bucket_id', postgresql.UUID(as_uuid=True), nullable=True))
-    op.create_foreign_key(None, 'files', 'buckets', ['bucket_id'], ['id'])
+    # NOT VALID skips the scan of existing files rows while the ADD COLUMN
+    # lock is held; the constraint still applies to every new write
+    op.execute(
+        "ALTER TABLE files ADD CONSTRAINT fk_files_bucket_id_buckets "
+        "FOREIGN KEY (bucket_id) REFERENCES buckets (id) NOT VALID"
+    )
+
+    # Validate after committing the DDL above. VALIDATE CONSTRAINT only takes a
+    # SHARE UPDATE EXCLUSIVE lock, so reads and writes on files carry on.
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE files VALIDATE CONSTRAINT fk_files_bucket_id_buckets")
 
 
 def downgrade():
-    # Drop foreign key constraint and bucket_id column from files table
-    op.drop_constraint(None, 'files', type_='foreignkey')
+    # Drop foreign key constraint and bucket_id column from files table. The FK
+    # is files_bucket_id_fkey on databases migrated before it was named
+    # explicitly, so drop whichever of the two exists.
+    op.execute("ALTER TABLE files DROP CONSTRAINT IF EXISTS fk_files_bucket_id_buckets")
+    op.execute("ALTER TABLE files DROP CONSTRAINT IF EXISTS files_bucket_id_fkey")
     op.drop_column('files', 'bucket_id')
 
     # Drop buckets table
@@ -16,17 +16,20 @@ branch_labels = None
 depends_on = None
 
 
+def _cors_origins_exists():
+    # Single catalog lookup instead of listing every table in the schema
+    connection = op.get_bind()
+    return connection.execute(sa.text("SELECT to_regclass('public.cors_origins') IS NOT NULL")).scalar()
+
+
 def upgrade():
     # Check if cors_origins table already exists
-    connection = op.get_bind()
-    inspector = sa.inspect(connection)
-    
-    if 'cors_origins' not in inspector.get_table_names():
+    if not _cors_origins_exists():
         # Create cors_origins table
         op.create_table(
             'cors_origins',
             sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
-            sa.Column('origin', sa.String(), nullable=False, unique=True),
+            sa.Column('origin', sa.String(), nullable=False),
             sa.Column('description', sa.Text(), nullable=True),
             sa.Column('is_active', sa.Boolean(), nullable=False, default=True),
             sa.Column('extra_metadata', postgresql.JSON(), nullable=True, default=dict),
@@ -37,19 +40,22 @@ def upgrade():
             sa.PrimaryKeyConstraint('id')
         )
         
-        # Create indexes
-        op.create_index(op.f('ix_cors_origins_origin'), 'cors_origins', ['origin'], unique=True)
-        op.create_index(op.f('ix_cors_origins_is_active'), 'cors_origins', ['is_active'], unique=False)
+        # Create indexes concurrently, outside the migration transaction, so
+        # building them never holds an exclusive lock on cors_origins
+        with op.get_context().autocommit_block():
+            op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_cors_origins_origin ON cors_origins (origin)")
+            op.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_cors_origins_origin ON cors_origins (origin)")
+            op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cors_origins_is_active ON cors_origins (is_active)")
+
+        # Promote the prebuilt index to the unique constraint on origin
+        op.execute("ALTER TABLE cors_origins ADD CONSTRAINT uq_cors_origins_origin UNIQUE USING INDEX uq_cors_origins_origin")
     else:
         print("cors_origins table already exists, skipping creation")
 
 
 def downgrade():
     # Check if cors_origins table exists before dropping
-    connection = op.get_bind()
-    inspector = sa.inspect(connection)
-    
-    if 'cors_origins' in inspector.get_table_names():
+    if _cors_origins_exists():
         # Drop indexes
         try:
             op.drop_index(op.f('ix_cors_origins_is_active'), table_name='cors_origins')
@@ -0,0 +1,34 @@
+"""Add (owner_id|bucket_id, created_at, id) indexes for keyset pagination of files
+
+Revision ID: add_files_created_at_indexes
+Revises: add_buckets_created_at_index
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_files_created_at_indexes'
+down_revision = 'add_buckets_created_at_index'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_files_owner_id_created_at_id', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_owner_id_created_at_id ON files (owner_id, created_at DESC, id DESC)'),
+    ('ix_files_bucket_id_created_at_id', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_bucket_id_created_at_id ON files (bucket_id, created_at DESC, id DESC)'),
+]
+
+
+def upgrade():
+    # Built concurrently, outside the migration transaction, so the files
+    # table stays writable while the indexes are created
+    with op.get_context().autocommit_block():
+        for _, create_sql in INDEXES:
+            op.execute(create_sql)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
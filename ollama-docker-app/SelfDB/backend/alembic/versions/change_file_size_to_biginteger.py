@@ -1,27 +1,72 @@
 """Change file size column from Integer to BigInteger
 
 Revision ID: change_file_size_to_biginteger
-Revises: remove_function_trigger_fields
+Revises: add_cors_origins_table
 Create Date: 2025-06-03 10:00:00.000000
 
 """
-from alembic import op
+import uuid
+
+from alembic import context, op
 import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = 'change_file_size_to_biginteger'
-down_revision = 'remove_function_trigger_fields'
+down_revision = 'add_cors_origins_table'
 branch_labels = None
 depends_on = None
 
+# Rows copied per committed backfill batch
+BACKFILL_BATCH_SIZE = 10000
+
+# Walks the primary key so each batch is a short index range scan instead of
+# re-scanning the already backfilled rows. The copy stays inside Postgres:
+# a COPY out and back in would ship every row through the client and need
+# a table rewrite lock, which is what this migration avoids.
+BACKFILL_SQL = """
+    WITH batch AS (
+        SELECT id FROM files
+        WHERE id > :last_id
+        ORDER BY id
+        LIMIT :batch_size
+    )
+    UPDATE files SET size_big = files.size
+    FROM batch
+    WHERE files.id = batch.id
+    RETURNING files.id
+"""
+
 
 def upgrade():
     """Change size column from Integer to BigInteger to support files larger than 2GB"""
-    # Change size column from Integer to BigInteger
-    op.alter_column('files', 'size',
-               existing_type=sa.INTEGER(),
-               type_=sa.BigInteger(),
-               existing_nullable=True)
+    # ALTER COLUMN ... TYPE would rewrite the whole table under an ACCESS
+    # EXCLUSIVE lock, so copy the values into a new bigint column in small,
+    # individually committed batches and swap the columns at the end.
+    op.add_column('files', sa.Column('size_big', sa.BigInteger(), nullable=True))
+
+    if not context.is_offline_mode():
+        connection = op.get_bind()
+        last_id = uuid.UUID(int=0)
+        with op.get_context().autocommit_block():
+            while True:
+                result = connection.execute(
+                    sa.text(BACKFILL_SQL),
+                    {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE},
+                )
+                batch_ids = result.scalars().all()
+                if not batch_ids:
+                    break
+                last_id = max(batch_ids)
+
+    # Block writes from here until the swap commits (reads carry on), so no
+    # insert or size update can land between the catch-up and the drop. The
+    # catch-up then copies every row whose size changed or appeared while the
+    # backfill was running. Dropping and renaming a column only touches the
+    # catalog, so the lock is brief; all of this runs in one transaction.
+    op.execute("LOCK TABLE files IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("UPDATE files SET size_big = size WHERE size_big IS DISTINCT FROM size")
+    op.drop_column('files', 'size')
+    op.alter_column('files', 'size_big', new_column_name='size')
 
 
 def downgrade():
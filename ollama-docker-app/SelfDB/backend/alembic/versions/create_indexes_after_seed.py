@@ -0,0 +1,41 @@
+"""Create secondary indexes after initial data is loaded
+
+Revision ID: create_indexes_after_seed
+Revises: change_file_size_to_biginteger
+Create Date: 2026-10-16 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_indexes_after_seed'
+down_revision = 'change_file_size_to_biginteger'
+branch_labels = None
+depends_on = None
+
+# Secondary (non-constraint) indexes that used to be built inline with their
+# tables in initial_migration and add_functions_tables. init.sh seeds the
+# database before running this revision, so the initial load does not pay
+# for index maintenance. IF NOT EXISTS keeps this a no-op on databases that
+# were created before the indexes moved here.
+INDEXES = [
+    ('ix_users_email', 'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email ON users (email)'),
+    ('idx_functions_owner_id', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_functions_owner_id ON functions (owner_id)'),
+    ('idx_functions_is_active', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_functions_is_active ON functions (is_active)'),
+    ('idx_function_versions_function_id', 'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_function_versions_function_id ON function_versions (function_id)'),
+]
+
+
+def upgrade():
+    # Built concurrently, outside the migration transaction, so existing
+    # traffic is never blocked by an exclusive lock
+    with op.get_context().autocommit_block():
+        for _, create_sql in INDEXES:
+            op.execute(create_sql)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -9,6 +9,8 @@ from alembic import op
 import sqlalchemy as sa
 from sqlalchemy.dialects import postgresql
 
+from app.db.migration_utils import execute_script
+
 # revision identifiers, used by Alembic.
 revision = '1a1a1a1a1a1a'
 down_revision = None
@@ -17,51 +19,51 @@ depends_on = None
 
 
 def upgrade():
-    # Create users table
-    op.create_table(
-        'users',
-        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
-        sa.Column('email', sa.String(), nullable=False),
-        sa.Column('hashed_password', sa.String(), nullable=False),
-        sa.Column('is_active', sa.Boolean(), nullable=False, default=True),
-        sa.Column('is_superuser', sa.Boolean(), nullable=False, default=False),
-        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
-        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
-        sa.PrimaryKeyConstraint('id'),
-        sa.UniqueConstraint('email')
-    )
-    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
-    
-    # Create roles table
-    op.create_table(
-        'roles',
-        sa.Column('id', sa.Integer(), nullable=False),
-        sa.Column('name', sa.String(), nullable=False),
-        sa.Column('description', sa.String(), nullable=True),
-        sa.PrimaryKeyConstraint('id')
-    )
-    op.create_index(op.f('ix_roles_name'), 'roles', ['name'], unique=True)
-    
-    # Create files table
-    op.create_table(
-        'files',
-        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
-        sa.Column('filename', sa.String(), nullable=False),
-        sa.Column('object_name', sa.String(), nullable=False),
-        sa.Column('bucket_name', sa.String(), nullable=False),
-        sa.Column('content_type', sa.String(), nullable=True),
-        sa.Column('size', sa.Integer(), nullable=True),
-        sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=False),
-        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
-        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
-        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
-        sa.PrimaryKeyConstraint('id'),
-        sa.UniqueConstraint('object_name')
-    )
+    # users and roles are independent and files only depends on users, so all
+    # three tables are created by a single script rather than one round trip
+    # per statement
+    execute_script("""
+        -- Create users table
+        CREATE TABLE users (
+            id UUID NOT NULL,
+            email VARCHAR NOT NULL,
+            hashed_password VARCHAR NOT NULL,
+            is_active BOOLEAN NOT NULL,
+            is_superuser BOOLEAN NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT users_pkey PRIMARY KEY (id),
+            CONSTRAINT users_email_key UNIQUE (email)
+        );
+
+        -- Create roles table
+        CREATE TABLE roles (
+            id SERIAL NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR,
+            CONSTRAINT roles_pkey PRIMARY KEY (id)
+        );
+        CREATE UNIQUE INDEX ix_roles_name ON roles (name);
+
+        -- Create files table
+        CREATE TABLE files (
+            id UUID NOT NULL,
+            filename VARCHAR NOT NULL,
+            object_name VARCHAR NOT NULL,
+            bucket_name VARCHAR NOT NULL,
+            content_type VARCHAR,
+            size INTEGER,
+            owner_id UUID NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT files_pkey PRIMARY KEY (id),
+            CONSTRAINT files_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES users (id),
+            CONSTRAINT files_object_name_key UNIQUE (object_name)
+        );
+    """)
 
 
 def downgrade():
     op.drop_table('files')
     op.drop_table('roles')
-    op.drop_index(op.f('ix_users_email'), table_name='users')
     op.drop_table('users')
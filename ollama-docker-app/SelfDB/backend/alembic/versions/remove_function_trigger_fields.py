@@ -17,20 +17,22 @@ depends_on = None
 
 
 def upgrade():
-    # Remove trigger-specific columns from functions table
-    op.drop_column('functions', 'trigger_type')
-    op.drop_column('functions', 'method')
-    op.drop_column('functions', 'path')
-    op.drop_column('functions', 'schedule')
-    op.drop_column('functions', 'table_name')
-    op.drop_column('functions', 'operations')
-    op.drop_column('functions', 'filter_conditions')
-    op.drop_column('functions', 'transaction_handling')
+    # Remove trigger-specific columns from functions table in one ALTER TABLE,
+    # so the exclusive lock is taken and the catalog updated only once
+    op.execute(
+        "ALTER TABLE functions "
+        "DROP COLUMN trigger_type, "
+        "DROP COLUMN method, "
+        "DROP COLUMN path, "
+        "DROP COLUMN schedule, "
+        "DROP COLUMN table_name, "
+        "DROP COLUMN operations, "
+        "DROP COLUMN filter_conditions, "
+        "DROP COLUMN transaction_handling"
+    )
     
-    # Drop the unused enums
-    op.execute('DROP TYPE IF EXISTS function_trigger_type')
-    op.execute('DROP TYPE IF EXISTS function_tx_handling')
-
+    # Drop the unused enums (nothing references them once the columns are gone)
+    op.execute('DROP TYPE IF EXISTS function_trigger_type, function_tx_handling')
 
 def downgrade():
     # Re-create the enums
@@ -1,42 +1,141 @@
-from typing import Generator, AsyncGenerator, Optional, Union, Literal
+from typing import Generator, AsyncGenerator, Optional, Union, Literal, TYPE_CHECKING
+from collections import OrderedDict, namedtuple
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
-from jose import jwt, JWTError
-from pydantic import ValidationError
+import hashlib
 import time
 
-from ..services.storage_service import StorageServiceClient
-
 from ..db.session import AsyncSessionLocal
 from ..core.config import settings
-from ..schemas.token import TokenPayload
+from ..core.security import is_valid_anon_key
 from ..models.user import User
 from ..crud.user import get_user_by_email
 
+if TYPE_CHECKING:
+    from ..services.storage_service import StorageServiceClient
+
 # Constant for anonymous user role
 ANON_USER_ROLE = "anon"
 
+# HTTP methods whose handlers never leave pending writes for get_db to commit
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
 # Asynchronous dependency to get a DB session
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_db(connection: HTTPConnection) -> AsyncGenerator[AsyncSession, None]:
     """
     FastAPI dependency that provides an asynchronous database session.
     Ensures the session is closed after the request is finished.
+    Read-only requests skip the final commit; their transaction simply ends
+    when the session is closed. WebSocket connections have no method and are
+    committed as before.
     """
+    read_only = connection.scope.get("method") in READ_ONLY_METHODS
     async with AsyncSessionLocal() as session:
         try:
             yield session
-            await session.commit()
+            if not read_only:
+                await session.commit()
         except Exception:
             await session.rollback()
             raise
 
+# The JWT library and the storage client (with its httpx pool) are only
+# needed once a request actually uses them, so they are imported on first
+# use instead of at worker start. The jwt module is kept here after that.
+_jwt = None
+
+def _get_jwt():
+    global _jwt
+    if _jwt is None:
+        import jwt
+        _jwt = jwt
+    return _jwt
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 # API Key header scheme for anonymous access
 api_key_header = APIKeyHeader(name="apikey", auto_error=False)
 
+# In-process cache of authenticated users, keyed by a digest of the bearer
+# token, so repeat requests skip the JWT verify and the users lookup.
+# Entries live for at most TOKEN_CACHE_TTL_SECONDS (or until the token expires).
+TOKEN_CACHE_TTL_SECONDS = 60
+TOKEN_CACHE_MAX_SIZE = 10_000
+_token_cache: "OrderedDict[bytes, tuple[float, User]]" = OrderedDict()
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def _get_cached_user(key: bytes) -> Optional[User]:
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at <= time.time():
+        _token_cache.pop(key, None)
+        return None
+    _token_cache.move_to_end(key)
+    return user
+
+def _cache_user(key: bytes, token_exp: Optional[int], user: User) -> None:
+    expires_at = time.time() + TOKEN_CACHE_TTL_SECONDS
+    if token_exp is not None:
+        expires_at = min(expires_at, token_exp)
+
+    # Cache a detached copy so the entry is never tied to (or mutated by)
+    # the session of the request that loaded it
+    snapshot = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+
+    _token_cache[key] = (expires_at, snapshot)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > TOKEN_CACHE_MAX_SIZE:
+        _token_cache.popitem(last=False)
+
+def invalidate_cached_user(user_id) -> None:
+    """
+    Drops every cached token that resolves to the given user.
+    Call this whenever a user is updated, deactivated or deleted.
+    """
+    user_id = str(user_id)
+    for key, (_, user) in list(_token_cache.items()):
+        if str(user.id) == user_id:
+            _token_cache.pop(key, None)
+
+async def _get_user_from_token(db: AsyncSession, token: str) -> Optional[User]:
+    """
+    Resolves a JWT to its user, or None if the token is invalid or the user
+    no longer exists. Repeat tokens are served from the token cache.
+    """
+    key = _token_cache_key(token)
+    cached_user = _get_cached_user(key)
+    if cached_user is not None:
+        # Attach the cached row to this session without hitting the database
+        return await db.merge(cached_user, load=False)
+
+    jwt = _get_jwt()
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+    # sub is only ever used as a lookup key, so a type check is all the
+    # validation it needs (no TokenPayload model per request)
+    email = payload.get("sub")
+    if not isinstance(email, str):
+        return None
+
+    user = await get_user_by_email(db, email=email)
+    if user is not None:
+        _cache_user(key, payload.get("exp"), user)
+    return user
+
 # Dependency to get the current user from a JWT token
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
@@ -49,18 +148,10 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenPayload(sub=email)
-    except (JWTError, ValidationError):
+    if not token:
         raise credentials_exception
 
-    user = await get_user_by_email(db, email=token_data.sub)
+    user = await _get_user_from_token(db, token)
     if user is None:
         raise credentials_exception
     return user
@@ -77,30 +168,39 @@ async def get_current_user_or_anon(
     - "anon" string if valid API key
     - None if neither is valid
     """
-    # First try JWT token authentication
-    if token:
-        try:
-            payload = jwt.decode(
-                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-            )
-            email: str = payload.get("sub")
-            if email is None:
-                return None
-            token_data = TokenPayload(sub=email)
-
-            user = await get_user_by_email(db, email=token_data.sub)
-            if user and user.is_active:
-                return user
-        except (JWTError, ValidationError):
-            pass
-
-    # Then try API key authentication
-    if api_key and settings.ANON_KEY and api_key == settings.ANON_KEY:
+    # Without a bearer token the request can only be anonymous, so answer
+    # from the API key alone and never touch the JWT or the database
+    if not token:
+        return ANON_USER_ROLE if is_valid_anon_key(api_key) else None
+
+    # Otherwise the token takes precedence: clients send the anon key on every
+    # request (AnonKeyEnforcerMiddleware requires it), including logged-in ones
+    user = await _get_user_from_token(db, token)
+    if user and user.is_active:
+        return user
+
+    # Then fall back to API key authentication
+    if is_valid_anon_key(api_key):
         return ANON_USER_ROLE
 
     # If neither authentication method worked
     return None
 
+# Dependency for endpoints open to both users and anonymous (ANON_KEY) callers
+async def require_user_or_anon(
+    current_user_or_anon: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+) -> Union[User, Literal["anon"]]:
+    """
+    Rejects requests that carry neither a valid JWT nor a valid API key.
+    """
+    if current_user_or_anon is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return current_user_or_anon
+
 # Dependency to get the current active user
 async def get_current_active_user(
     current_user_or_anon: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
@@ -126,6 +226,44 @@ async def get_current_active_user(
 
     return current_user_or_anon
 
+# What write endpoints need to authorise a caller, without the full User row
+UserCtx = namedtuple("UserCtx", "id is_superuser")
+
+def _user_credentials_exception(api_key: Optional[str]) -> HTTPException:
+    # Same responses get_current_active_user gives anonymous and unauthenticated callers
+    if is_valid_anon_key(api_key):
+        return HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication with user credentials required for this endpoint",
+        )
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# Dependency to get the current user's id and role
+async def get_current_user_ctx(
+    db: AsyncSession = Depends(get_db),
+    token: Optional[str] = Depends(oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+) -> UserCtx:
+    """
+    Returns (id, is_superuser) for the caller. The user is resolved through
+    the token cache like get_current_user, so a repeat token issues no users
+    SELECT, while a deleted, deactivated or demoted user (whose cache entries
+    invalidate_cached_user drops) is refused on the next request.
+    """
+    if not token:
+        raise _user_credentials_exception(api_key)
+
+    user = await _get_user_from_token(db, token)
+    if user is None:
+        raise _user_credentials_exception(api_key)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return UserCtx(user.id, user.is_superuser)
+
 # Dependency to get the current active superuser
 async def get_current_active_superuser(
     current_user: User = Depends(get_current_active_user),
@@ -140,41 +278,32 @@ async def get_current_active_superuser(
     return current_user
 
 
-async def get_storage_service_client(current_user: Optional[User] = Depends(get_current_active_user)) -> StorageServiceClient:
+async def get_storage_service_client(current_user: Optional[User] = Depends(get_current_active_user)) -> "StorageServiceClient":
     """
     Returns a configured storage service client.
     This replaces the MinIO client dependency.
     """
+    from ..services.storage_service import StorageServiceClient
+    from .deps_storage import get_storage_token
+
     token = None
     if current_user:
-        # Generate a JWT token for the user to authenticate with the storage service
-        token_data = {
-            "sub": str(current_user.id),
-            "exp": int(time.time() + 3600)  # 1 hour expiry
-        }
-        token = jwt.encode(token_data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    
-    client = StorageServiceClient(
+        token = get_storage_token(current_user)
+
+    # The client borrows the shared connection pool, so there is nothing to close
+    return StorageServiceClient(
         base_url=settings.STORAGE_SERVICE_URL,
         token=token,
         anon_key=settings.ANON_KEY
     )
-    
-    try:
-        yield client
-    finally:
-        await client.close()
 
-async def get_storage_service_client_anon() -> StorageServiceClient:
+async def get_storage_service_client_anon() -> "StorageServiceClient":
     """
     Returns a storage service client with anonymous access.
     """
-    client = StorageServiceClient(
+    from ..services.storage_service import StorageServiceClient
+
+    return StorageServiceClient(
         base_url=settings.STORAGE_SERVICE_URL,
         anon_key=settings.ANON_KEY
     )
-    
-    try:
-        yield client
-    finally:
-        await client.close()
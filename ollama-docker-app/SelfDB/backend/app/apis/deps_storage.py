@@ -1,39 +1,74 @@
 import httpx
 import logging
-from typing import Optional, Dict, Any, BinaryIO, AsyncGenerator
+import orjson
+from typing import Optional, Dict, Any, BinaryIO, AsyncGenerator, List, Tuple, Union
+from collections import OrderedDict
 from fastapi import UploadFile, Depends, HTTPException, status
 import io
 import os
-from urllib.parse import urljoin
+import time
+from uuid import UUID
 
 from ..core.config import settings
+from ..core.http import get_shared_client
+from ..core.security import encode_token
 from ..models.user import User
-from .deps import get_current_active_user
+from .deps import get_current_active_user, get_current_user_ctx, UserCtx
 
 logger = logging.getLogger(__name__)
 
+# Public base URL for direct download/view links, normalised once at import
+# instead of on every call
+_EXTERNAL_BASE_URL = str(settings.STORAGE_SERVICE_EXTERNAL_URL).rstrip("/")
+
+# Read size when relaying a download from the storage service. Larger reads
+# mean far fewer Python-level iterations per streamed megabyte.
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Set STORAGE_DEBUG_STREAM=1 to log progress while relaying downloads
+_DEBUG_STREAM = os.environ.get("STORAGE_DEBUG_STREAM", "").lower() in ("1", "true", "yes")
+
 class StorageServiceClient:
     """
     Client for interacting with the storage service.
     This replaces the MinIO client with HTTP requests to our custom storage service.
+
+    The underlying httpx client is borrowed, not owned: it defaults to the
+    shared client from get_shared_client() and is never closed by this class.
     """
-    def __init__(self, base_url: str, token: Optional[str] = None, anon_key: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str] = None,
+        anon_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.token = token
         self.anon_key = anon_key
-        self.client = httpx.AsyncClient(timeout=60.0)  # Longer timeout for file uploads/downloads
-
-    async def close(self):
-        await self.client.aclose()
-
-    def _get_headers(self) -> Dict[str, str]:
-        """Get headers with authentication if available"""
-        headers = {"Accept": "application/json"}
-        if self.token:
-            headers["Authorization"] = f"Bearer {self.token}"
-        elif self.anon_key:
-            headers["Authorization"] = f"Bearer {self.anon_key}"
-        return headers
+        self.client = client if client is not None else get_shared_client()
+
+        # The credentials never change for the lifetime of a client, so the
+        # headers (and their log-safe copy) are built once here. They are kept
+        # as pre-encoded, lower-cased (bytes, bytes) pairs, which httpx takes
+        # as they are instead of normalising str keys and values per request.
+        self._headers: List[Tuple[bytes, bytes]] = [(b"accept", b"application/json")]
+        self._log_safe_headers = {"Accept": "application/json"}
+        if token or anon_key:
+            self._headers.append((b"authorization", b"Bearer " + (token or anon_key).encode()))
+            self._log_safe_headers["Authorization"] = "Bearer [REDACTED]"
+        self._json_headers = self._headers + [(b"content-type", b"application/json")]
+        # Downloads ask for the body as stored, so it can be relayed with
+        # aiter_raw() without passing through httpx's decoding layer
+        self._stream_headers = self._headers + [(b"accept-encoding", b"identity")]
+
+    def _get_headers(self) -> List[Tuple[bytes, bytes]]:
+        """Get headers with authentication if available (shared, do not mutate)"""
+        return self._headers
+
+    async def _send_json(self, method: str, url: str, data: Dict[str, Any]) -> httpx.Response:
+        """Send a JSON body, encoded with orjson instead of the stdlib json module"""
+        return await self.client.request(method, url, content=orjson.dumps(data), headers=self._json_headers)
 
     async def create_bucket(self, name: str, is_public: bool = True) -> Dict[str, Any]:
         """Create a new bucket"""
@@ -41,9 +76,9 @@ class StorageServiceClient:
         data = {"name": name, "is_public": is_public}
 
         try:
-            response = await self.client.post(url, json=data, headers=self._get_headers())
+            response = await self._send_json("POST", url, data)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error creating bucket: {e.response.text}")
             raise HTTPException(
@@ -58,7 +93,7 @@ class StorageServiceClient:
         try:
             response = await self.client.get(url, headers=self._get_headers())
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error listing buckets: {e.response.text}")
             raise HTTPException(
@@ -73,7 +108,7 @@ class StorageServiceClient:
         try:
             response = await self.client.get(url, headers=self._get_headers())
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error getting bucket: {e.response.text}")
             raise HTTPException(
@@ -87,9 +122,9 @@ class StorageServiceClient:
         data = {"is_public": is_public}
 
         try:
-            response = await self.client.put(url, json=data, headers=self._get_headers())
+            response = await self._send_json("PUT", url, data)
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error updating bucket: {e.response.text}")
             raise HTTPException(
@@ -119,11 +154,14 @@ class StorageServiceClient:
         """
         logger.warning("Direct server-side upload_file is deprecated. Use pre-signed URLs.")
         url = f"{self.base_url}/files/upload/{bucket_name}"
-        form = {"file": (file.filename, await file.read(), file.content_type)}
+        # Hand httpx the underlying spooled file so the multipart body is read
+        # in chunks while sending, rather than loading the whole upload in memory
+        await file.seek(0)
+        form = {"file": (file.filename, file.file, file.content_type)}
         try:
             response = await self.client.post(url, files=form, headers=self._get_headers())
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error uploading file (deprecated method): {e.response.text}")
             raise HTTPException(
@@ -145,9 +183,9 @@ class StorageServiceClient:
         logger.info(f"Requesting pre-signed upload URL for {bucket_name}/{object_name}, content_type: {content_type}")
 
         try:
-            response = await self.client.post(url, json=payload, headers=self._get_headers())
+            response = await self._send_json("POST", url, payload)
             response.raise_for_status()
-            presigned_data = response.json()
+            presigned_data = orjson.loads(response.content)
             logger.info(f"Successfully generated pre-signed upload URL for {bucket_name}/{object_name}: {presigned_data.get('upload_url')}")
             # Ensure expected fields are present, e.g., 'upload_url' and 'method'
             if 'upload_url' not in presigned_data or 'method' not in presigned_data:
@@ -177,7 +215,7 @@ class StorageServiceClient:
         try:
             response = await self.client.get(url, headers=self._get_headers())
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except httpx.HTTPStatusError as e:
             logger.error(f"Error listing files: {e.response.text}")
             raise HTTPException(
@@ -197,15 +235,15 @@ class StorageServiceClient:
             # Use a timeout configuration optimized for streaming large files
             timeout = httpx.Timeout(5.0, read=60.0, write=60.0, pool=5.0)
 
-            logger.info(f"Starting file download stream from: {url}")
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                async with client.stream("GET", url, headers=self._get_headers()) as response:
-                    response.raise_for_status()
-                    # Log response headers to help diagnose issues
-                    logger.info(f"Response headers: {response.headers}")
-                    # Use a moderate chunk size for better performance and to avoid corruption
-                    async for chunk in response.aiter_bytes(chunk_size=16384):  # 16KB chunks
-                        yield chunk
+            if _DEBUG_STREAM:
+                logger.debug("Starting file download stream from: %s", url)
+            async with self.client.stream("GET", url, headers=self._stream_headers, timeout=timeout) as response:
+                response.raise_for_status()
+                # Log response headers to help diagnose issues
+                if _DEBUG_STREAM:
+                    logger.debug("Response headers: %s", response.headers)
+                async for chunk in response.aiter_raw(chunk_size=STREAM_CHUNK_SIZE):
+                    yield chunk
         except httpx.HTTPStatusError as e:
             logger.error(f"Error downloading file: {e.response.text if hasattr(e.response, 'text') else str(e)}")
             raise HTTPException(
@@ -240,81 +278,61 @@ class StorageServiceClient:
         NOTE: This streams through the backend. For client downloads, prefer get_direct_download_url.
         The 'file_name' parameter is the object_name/key within the bucket.
         """
-        import time
-        start_time = time.time()
-        
         # 'file_name' should be the actual key within the bucket.
         # The old logic for stripping bucket prefix is removed here, assuming caller provides correct 'file_name'.
         # If object_name in DB might still contain prefixes, that needs to be handled by the caller.
-        original_file_name_param = file_name # for logging
-        
-        path_proc_time = time.time() - start_time
-        logger.info(f"[TIMING] Path processing took {path_proc_time*1000:.2f}ms (download_file_content)")
-        logger.info(f"Attempting to download file (stream via backend): bucket='{bucket_name}', object_name='{file_name}' (original param: '{original_file_name_param}')")
-
         url = f"{self.base_url}/files/download/{bucket_name}/{file_name}"
-        logger.info(f"Constructed download URL (stream via backend): {url}")
 
         try:
             # Use a timeout configuration optimized for streaming large files
             timeout = httpx.Timeout(5.0, read=60.0, write=60.0, pool=5.0)
 
-            # Create a new client with optimized timeout settings
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                # Sanitize headers before logging
-                log_safe_headers = {**self._get_headers()}
-                if 'Authorization' in log_safe_headers:
-                    log_safe_headers['Authorization'] = 'Bearer [REDACTED]'
-                
-                logger.info(f"Sending GET request to {url} with headers: {log_safe_headers}")
-                request_start_time = time.time()
-                async with client.stream("GET", url, headers=self._get_headers()) as response:
-                    response_received_time = time.time()
-                    logger.info(f"[TIMING] Time to receive response headers: {(response_received_time - request_start_time)*1000:.2f}ms")
-                    logger.info(f"Received response from {url}, status_code: {response.status_code}")
-                    response.raise_for_status() # Check for HTTP errors first
-
-                    # Log response headers for debugging
-                    logger.info(f"Storage service response headers: {response.headers}")
-                    content_length_from_storage = response.headers.get("Content-Length")
-                    content_type_from_storage = response.headers.get("Content-Type")
-                    logger.info(f"Storage service reported Content-Length: {content_length_from_storage}, Content-Type: {content_type_from_storage}")
-
-                    # Stream the response in chunks
+            # Request/response diagnostics only run with STORAGE_DEBUG_STREAM set
+            if _DEBUG_STREAM:
+                logger.debug("Sending GET request to %s with headers: %s", url, self._log_safe_headers)
+                request_start_time = time.monotonic()
+            async with self.client.stream("GET", url, headers=self._stream_headers, timeout=timeout) as response:
+                response.raise_for_status() # Check for HTTP errors first
+
+                content_length_from_storage = response.headers.get("Content-Length")
+                if _DEBUG_STREAM:
+                    logger.debug("Response headers from %s after %.2fms: status_code=%d, headers=%s",
+                                 url, (time.monotonic() - request_start_time) * 1000,
+                                 response.status_code, response.headers)
+
+                # Stream the response in chunks (raw, as requested above, so the
+                # byte count matches Content-Length). The default loop only counts
+                # bytes; per-chunk progress logging is opt-in (STORAGE_DEBUG_STREAM)
+                # so nothing but the relay itself runs per chunk.
+                total_bytes_streamed = 0
+                chunks = response.aiter_raw(chunk_size=STREAM_CHUNK_SIZE)
+                if _DEBUG_STREAM:
                     chunk_count = 0
-                    total_bytes_streamed = 0
-                    first_chunk_time = None
-
-                    # Use a smaller chunk size for better reliability
-                    async for chunk in response.aiter_bytes(chunk_size=8192):  # 8KB chunks
-                        if chunk_count == 0:
-                            first_chunk_time = time.time()
-                            logger.info(f"[TIMING] Time to first chunk: {(first_chunk_time - request_start_time)*1000:.2f}ms")
-                        
-                        if not chunk: # Handle empty chunks, though aiter_bytes usually doesn't yield them unless stream ends
-                            logger.warning(f"Received empty chunk while streaming from {url}. Chunk count: {chunk_count}, Total bytes: {total_bytes_streamed}")
-                            continue
+                    async for chunk in chunks:
                         chunk_count += 1
                         total_bytes_streamed += len(chunk)
-                        if chunk_count % 100 == 0:  # Log every 100 chunks to avoid excessive logging
-                            current_time = time.time()
-                            elapsed = current_time - first_chunk_time if first_chunk_time else 0
-                            rate = total_bytes_streamed / elapsed if elapsed > 0 else 0
-                            logger.info(f"Streaming chunk {chunk_count} from {url}: {len(chunk)} bytes, total bytes streamed so far: {total_bytes_streamed}, rate: {rate/1024:.2f} KB/s")
+                        if chunk_count % 400 == 0:
+                            logger.debug("Streaming chunk %d from %s: %d bytes, total bytes streamed so far: %d",
+                                         chunk_count, url, len(chunk), total_bytes_streamed)
                         yield chunk
-                    
-                    logger.info(f"Finished streaming file from {url}: total_chunks={chunk_count}, total_bytes_streamed={total_bytes_streamed}")
-                    if content_length_from_storage and int(content_length_from_storage) != total_bytes_streamed:
-                        logger.error(
-                            f"Mismatch in Content-Length for {url}: "
-                            f"Expected (from storage header): {content_length_from_storage}, "
-                            f"Actual streamed: {total_bytes_streamed}"
-                        )
+                else:
+                    async for chunk in chunks:
+                        total_bytes_streamed += len(chunk)
+                        yield chunk
+                
+                if _DEBUG_STREAM:
+                    logger.debug("Finished streaming file from %s: total_bytes_streamed=%d", url, total_bytes_streamed)
+                if content_length_from_storage and int(content_length_from_storage) != total_bytes_streamed:
+                    logger.error(
+                        f"Mismatch in Content-Length for {url}: "
+                        f"Expected (from storage header): {content_length_from_storage}, "
+                        f"Actual streamed: {total_bytes_streamed}"
+                    )
 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error downloading file from {url}: status_code={e.response.status_code}, response_text='{e.response.text if hasattr(e.response, 'text') else str(e)}'")
             # Log request details that led to error
-            logger.error(f"Request details: method=GET, url={url}, headers={self._get_headers()}")
+            logger.error(f"Request details: method=GET, url={url}, headers={self._log_safe_headers}")
             raise HTTPException(
                 status_code=e.response.status_code,
                 detail=f"Storage service HTTP error: {str(e)}" # Propagate a cleaner message
@@ -330,9 +348,7 @@ class StorageServiceClient:
         """Generate a direct download URL for the specified object."""
         try:
             # Use the configured external storage URL from settings
-            public_url = str(settings.STORAGE_SERVICE_EXTERNAL_URL).rstrip("/")
-            download_path = f"/files/download/{bucket_name}/{object_name}"
-            download_url = f"{public_url}{download_path}"
+            download_url = f"{_EXTERNAL_BASE_URL}/files/download/{bucket_name}/{object_name}"
             
             logger.info(f"Generated direct download URL for {bucket_name}/{object_name}: {download_url}")
             return download_url
@@ -347,14 +363,10 @@ class StorageServiceClient:
         """Generate a direct view URL for the specified object."""
         try:
             # Use the configured external storage URL from settings
-            public_url = str(settings.STORAGE_SERVICE_EXTERNAL_URL).rstrip("/")
-            view_path = f"/files/view/{bucket_name}/{object_name}"
-            
-            # Add content_type as a query parameter if provided
+            # content_type, if provided, is added as a query parameter
+            view_url = f"{_EXTERNAL_BASE_URL}/files/view/{bucket_name}/{object_name}"
             if content_type:
-                view_path += f"?content_type={content_type}"
-            
-            view_url = f"{public_url}{view_path}"
+                view_url += f"?content_type={content_type}"
             
             logger.info(f"Generated direct view URL for {bucket_name}/{object_name} with content_type={content_type}: {view_url}")
             return view_url
@@ -366,46 +378,97 @@ class StorageServiceClient:
             )
 
 
-async def get_storage_service_client(current_user: Optional[User] = Depends(get_current_active_user)) -> AsyncGenerator[StorageServiceClient, None]:
+# Storage service JWTs already signed per user, as
+# (user_id, is_superuser) -> (exp, token), least recently used first. A token
+# is reused until it is within STORAGE_TOKEN_REFRESH_MARGIN seconds of
+# expiring, and at most STORAGE_TOKEN_CACHE_MAX_SIZE users are kept. Signing
+# never awaits, so concurrent requests cannot race here.
+STORAGE_TOKEN_LIFETIME_SECONDS = 3600
+STORAGE_TOKEN_REFRESH_MARGIN = 300
+STORAGE_TOKEN_CACHE_MAX_SIZE = 10_000
+_user_token_cache: "OrderedDict[Tuple[UUID, bool], Tuple[int, str]]" = OrderedDict()
+
+def get_storage_token(user: Union[User, UserCtx]) -> str:
+    """
+    Returns a JWT for the user to authenticate with the storage service,
+    signing a new one only when the cached token is close to expiry.
+    """
+    # is_superuser is part of the key so a role change never reuses a token
+    # carrying the old claim
+    key = (user.id, bool(user.is_superuser))
+    now = int(time.time())
+    cached = _user_token_cache.get(key)
+    if cached is not None and cached[0] - now > STORAGE_TOKEN_REFRESH_MARGIN:
+        _user_token_cache.move_to_end(key)
+        return cached[1]
+
+    # Signed inline rather than through asyncio.to_thread: one HS256 signature
+    # costs ~20us, less than the thread hand-off, and with the cache above it
+    # runs about once an hour per user. encode_token reuses the HMAC state
+    # keyed with SECRET_KEY instead of re-deriving it per token.
+    exp = now + STORAGE_TOKEN_LIFETIME_SECONDS
+    token_data = {
+        "sub": str(user.id),
+        "is_superuser": user.is_superuser,
+        "exp": exp
+    }
+    token = encode_token(token_data)
+    _user_token_cache[key] = (exp, token)
+    _user_token_cache.move_to_end(key)
+    while len(_user_token_cache) > STORAGE_TOKEN_CACHE_MAX_SIZE:
+        _user_token_cache.popitem(last=False)
+    return token
+
+async def get_storage_service_client(current_user: Optional[User] = Depends(get_current_active_user)) -> StorageServiceClient:
     """
     Returns a configured storage service client.
     This replaces the MinIO client dependency.
     """
     token = None
     if current_user:
-        # In a real implementation, you would generate a token for the user
-        # For now, we'll use the user's ID as a placeholder
-        from jose import jwt
-        import time
-
-        token_data = {
-            "sub": str(current_user.id),
-            "is_superuser": current_user.is_superuser,  # NEW
-            "exp": int(time.time() + 3600)  # 1 hour expiry (as integer)
-        }
-        token = jwt.encode(token_data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-
-    client = StorageServiceClient(
+        token = get_storage_token(current_user)
+
+    # The client borrows the shared connection pool, so there is nothing to
+    # close and the dependency can return it instead of yielding
+    return StorageServiceClient(
         base_url=settings.STORAGE_SERVICE_URL,
         token=token,
-        anon_key=settings.ANON_KEY
+        anon_key=settings.ANON_KEY,
+        client=get_shared_client()
     )
 
-    try:
-        yield client
-    finally:
-        await client.close()
-
-async def get_storage_service_client_anon() -> AsyncGenerator[StorageServiceClient, None]:
+async def get_storage_service_client_for_ctx(current_user: UserCtx = Depends(get_current_user_ctx)) -> StorageServiceClient:
     """
-    Returns a storage service client with anonymous access.
+    Same as get_storage_service_client, for endpoints that authorise the
+    caller with get_current_user_ctx.
     """
-    client = StorageServiceClient(
+    return StorageServiceClient(
         base_url=settings.STORAGE_SERVICE_URL,
-        anon_key=settings.ANON_KEY
+        token=get_storage_token(current_user),
+        anon_key=settings.ANON_KEY,
+        client=get_shared_client()
     )
 
-    try:
-        yield client
-    finally:
-        await client.close()
+# Anonymous clients carry no per-request state, so one is shared by every
+# anonymous request. It is rebuilt if the shared httpx client was replaced.
+_anon_storage_client: Optional[StorageServiceClient] = None
+
+def get_anon_storage_client() -> StorageServiceClient:
+    """
+    Returns the shared storage service client with anonymous access.
+    """
+    global _anon_storage_client
+    shared = get_shared_client()
+    if _anon_storage_client is None or _anon_storage_client.client is not shared:
+        _anon_storage_client = StorageServiceClient(
+            base_url=settings.STORAGE_SERVICE_URL,
+            anon_key=settings.ANON_KEY,
+            client=shared
+        )
+    return _anon_storage_client
+
+async def get_storage_service_client_anon() -> StorageServiceClient:
+    """
+    Returns a storage service client with anonymous access.
+    """
+    return get_anon_storage_client()
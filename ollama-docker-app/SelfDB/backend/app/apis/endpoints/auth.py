@@ -3,19 +3,23 @@ from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
 
 from ...core.config import settings
 from ...core.security import create_access_token
 from ...schemas.token import TokenWithUserInfo, RefreshTokenRequest, Token
 from ...schemas.user import User, UserCreate
-from ...crud.user import authenticate_user, create_user, get_user_by_email
-from ...crud.refresh_token import create_refresh_token_db, get_refresh_token, revoke_refresh_token
+from ...crud.user import authenticate_user, create_user_if_not_exists
+from ...crud.refresh_token import create_refresh_token_db, get_refresh_token_with_email, revoke_refresh_token
 from ..deps import get_db
 
-router = APIRouter()
+# Token responses are rendered with orjson rather than the stdlib json module
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Access token lifetime, fixed for the life of the process
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
 @router.post("/login", response_model=TokenWithUserInfo)
 async def login_access_token(
@@ -32,11 +36,9 @@ async def login_access_token(
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
 
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
     # Create access token
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=ACCESS_TOKEN_EXPIRES
     )
     
     # Create refresh token
@@ -59,19 +61,16 @@ async def refresh_access_token(
     """
     Get a new access token using a refresh token.
     """
-    # Get refresh token from database
-    db_token = await get_refresh_token(db, refresh_request.refresh_token)
-    if not db_token:
+    # Get refresh token and the associated user's email in one round trip
+    token_row = await get_refresh_token_with_email(db, refresh_request.refresh_token)
+    if not token_row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired refresh token",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Get associated user
-    query = text("SELECT email FROM users WHERE id = :user_id")
-    result = await db.execute(query, {"user_id": db_token.user_id})
-    user_email = result.scalar_one_or_none()
+    _, user_email = token_row
     
     if not user_email:
         # Revoke the token if user doesn't exist
@@ -83,12 +82,10 @@ async def refresh_access_token(
         )
     
     # Create new access token
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
     return {
         "access_token": create_access_token(
             subject=user_email, 
-            expires_delta=access_token_expires
+            expires_delta=ACCESS_TOKEN_EXPIRES
         ),
         "token_type": "bearer"
     }
@@ -102,11 +99,10 @@ async def register_user(
     """
     Register a new user.
     """
-    user = await get_user_by_email(db, email=user_in.email)
-    if user:
+    user = await create_user_if_not_exists(db, user_in=user_in)
+    if not user:
         raise HTTPException(
             status_code=400,
             detail="A user with this email already exists.",
         )
-    user = await create_user(db, user_in=user_in)
     return user
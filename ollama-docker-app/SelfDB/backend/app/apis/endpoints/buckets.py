@@ -1,28 +1,36 @@
-from typing import Any, List, Union, Literal
+from typing import Any, Dict, List, Optional, Tuple, Union, Literal
+import asyncio
+from collections import OrderedDict
 import uuid
 import json
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 # Remove MinIO imports
-from fastapi.encoders import jsonable_encoder
 
 from ...schemas.bucket import Bucket, BucketCreate, BucketUpdate, BucketWithStats
 from ...schemas.file import File
 from ...models.user import User
 from ...crud.bucket import (
     get_bucket,
+    get_bucket_owner,
     get_buckets_by_owner,
-    get_public_buckets,
-    get_all_buckets,
+    get_all_buckets_with_stats,
+    get_bucket_with_stats,
     create_bucket,
     update_bucket,
-    delete_bucket,
-    get_bucket_stats
+    delete_bucket
 )
-from ...crud.file import get_files_by_bucket
-from ..deps import get_db, get_current_active_user, get_current_user_or_anon, ANON_USER_ROLE
-from ..deps_storage import get_storage_service_client, StorageServiceClient
+from ...crud.file import get_files_by_bucket_light
+from ..streaming import json_list_response, parse_cursor, next_cursor_headers
+from ..deps import get_db, get_current_active_user, get_current_user_ctx, require_user_or_anon, UserCtx, ANON_USER_ROLE
+from ..deps_storage import get_storage_service_client, get_storage_service_client_for_ctx, StorageServiceClient
 from ...core.config import settings
 from ...db.notify import emit_table_notification
 
@@ -31,74 +39,125 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Dump a whole page of buckets in one pydantic-core pass. Bucket rows come
+# from our own stats query, so they skip validation and are built with
+# BucketWithStats.from_row.
+_bucket_list_adapter = TypeAdapter(List[BucketWithStats])
+
+# Listings that may be large are written out a few rows at a time (see
+# ..streaming). The rows are fetched before the response starts, because
+# get_db closes the session before a streamed body is sent.
+_bucket_adapter = TypeAdapter(BucketWithStats)
+_file_adapter = TypeAdapter(File)
+
+# Serialized /public pages keyed by (skip, limit, cursor). The API runs as a
+# single process, so this dict is shared by every request; bucket and file
+# writes clear it and the TTL bounds anything else that slips through.
+# The key comes from an unauthenticated request, so the cache is an LRU of at
+# most PUBLIC_BUCKETS_CACHE_MAX_SIZE pages and expired pages are dropped when
+# they are next looked up.
+PUBLIC_BUCKETS_CACHE_TTL_SECONDS = 30
+PUBLIC_BUCKETS_CACHE_MAX_SIZE = 256
+_public_buckets_cache: "OrderedDict[Tuple[int, int, Optional[str]], Tuple[float, bytes, Dict[str, str]]]" = OrderedDict()
+
+def _ensure_bucket_visible(requester: Union[User, Literal["anon"]], is_public: bool) -> None:
+    """
+    Anonymous users can only access public buckets.
+    """
+    if requester == ANON_USER_ROLE and not is_public:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This bucket is not public"
+        )
+
+def invalidate_public_buckets_cache() -> None:
+    """
+    Drop every cached public bucket page.
+    Call after any change to buckets or to the files they contain.
+    """
+    _public_buckets_cache.clear()
+
+# Set on a session's info by writes that leave their commit to get_db; the
+# cache is invalidated once that commit has happened, so a listing running
+# concurrently cannot re-cache stats from before the change.
+_PUBLIC_BUCKETS_CHANGED = "public_buckets_changed"
+
+def invalidate_public_buckets_cache_on_commit(db: AsyncSession) -> None:
+    """
+    Same as invalidate_public_buckets_cache, deferred until db commits.
+    """
+    db.info[_PUBLIC_BUCKETS_CHANGED] = True
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_public_buckets_cache_after_commit(session: Session) -> None:
+    if session.info.pop(_PUBLIC_BUCKETS_CHANGED, False):
+        invalidate_public_buckets_cache()
+
 @router.get("", response_model=List[BucketWithStats])
 async def get_buckets(
     db: AsyncSession = Depends(get_db),
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> Any:
     """
-    Get buckets based on authentication status.
+    Get buckets based on authentication status, newest first.
     Authenticated users can see all buckets (both public and private).
     Anonymous users (with ANON_KEY) can see all buckets (for compatibility with open-discussion-board).
+    Pass the X-Next-Cursor header of a full page as `cursor` to fetch the next one.
     """
-    # Check permissions
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-
-    if not is_authenticated_user and not is_anon_request:
-        # No authentication provided
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication required",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
+    after = parse_cursor(cursor)
 
-    # Get buckets based on authentication status
-    if is_authenticated_user:
-        logger.info(f"Getting all buckets for authenticated user {requester.id}")
-        buckets = await get_all_buckets(db, skip=skip, limit=limit)
-    else:
-        # For anonymous users, get all buckets (for compatibility with open-discussion-board)
+    # Anonymous users also get all buckets (for compatibility with open-discussion-board)
+    is_anon_request = requester == ANON_USER_ROLE
+    if is_anon_request:
         logger.info("Getting all buckets for anonymous user")
-        buckets = await get_all_buckets(db, skip=skip, limit=limit)
-
-    # Add stats to each bucket
-    result = []
-    for bucket in buckets:
-        stats = await get_bucket_stats(db, bucket.id)
-        bucket_dict = Bucket.model_validate(bucket).model_dump()
-        bucket_dict.update(stats)
-        result.append(bucket_dict)
+    else:
+        logger.info(f"Getting all buckets for authenticated user {requester.id}")
+    buckets = await get_all_buckets_with_stats(db, skip=skip, limit=limit, after=after)
 
-    logger.info(f"Found {len(result)} buckets for {'anonymous' if is_anon_request else 'authenticated'} user")
-    return result
+    # Stats are joined in by the query, so each row is already complete
+    logger.info(f"Found {len(buckets)} buckets for {'anonymous' if is_anon_request else 'authenticated'} user")
+    return json_list_response(_bucket_adapter, buckets, next_cursor_headers(buckets, limit), BucketWithStats.from_row)
 
 @router.get("/public", response_model=List[BucketWithStats])
 async def get_public_buckets_endpoint(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> Any:
     """
-    Get all public buckets for unauthenticated users.
+    Get all public buckets for unauthenticated users, newest first.
     Unauthenticated users can only see public buckets.
+    Pass the X-Next-Cursor header of a full page as `cursor` to fetch the next one.
     """
+    cache_key = (skip, limit, cursor)
+    cached = _public_buckets_cache.get(cache_key)
+    if cached:
+        if cached[0] > time.monotonic():
+            _public_buckets_cache.move_to_end(cache_key)
+            return Response(content=cached[1], media_type="application/json", headers=cached[2])
+        _public_buckets_cache.pop(cache_key, None)
+
+    after = parse_cursor(cursor)
+
     # Get public buckets
     logger.info("Getting public buckets for unauthenticated user")
-    buckets = await get_public_buckets(db, skip=skip, limit=limit)
+    buckets = await get_all_buckets_with_stats(db, skip=skip, limit=limit, public_only=True, after=after)
 
-    # Add stats to each bucket
-    result = []
-    for bucket in buckets:
-        stats = await get_bucket_stats(db, bucket.id)
-        bucket_dict = Bucket.model_validate(bucket).model_dump()
-        bucket_dict.update(stats)
-        result.append(bucket_dict)
+    # Stats are joined in by the query, so each row is already complete
+    result = _bucket_list_adapter.dump_python([BucketWithStats.from_row(row) for row in buckets], mode="json")
 
     logger.info(f"Found {len(result)} public buckets")
-    return result
+    body = orjson.dumps(result)
+    headers = next_cursor_headers(buckets, limit)
+    _public_buckets_cache[cache_key] = (time.monotonic() + PUBLIC_BUCKETS_CACHE_TTL_SECONDS, body, headers)
+    _public_buckets_cache.move_to_end(cache_key)
+    while len(_public_buckets_cache) > PUBLIC_BUCKETS_CACHE_MAX_SIZE:
+        _public_buckets_cache.popitem(last=False)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.post("", response_model=Bucket, status_code=status.HTTP_201_CREATED)
 async def create_bucket_endpoint(
@@ -112,43 +171,48 @@ async def create_bucket_endpoint(
     Create a new bucket.
     """
     try:
-        # Create bucket in database
-        db_bucket = await create_bucket(
-            db=db,
-            bucket_in=bucket_in,
-            owner_id=current_user.id
+        # The database record and the storage service bucket only share the
+        # name, so create both concurrently instead of back to back
+        logger.info(f"Creating bucket {bucket_in.name} in database and storage service")
+        db_result, storage_result = await asyncio.gather(
+            create_bucket(db=db, bucket_in=bucket_in, owner_id=current_user.id),
+            storage_client.create_bucket(name=bucket_in.name, is_public=bucket_in.is_public),
+            return_exceptions=True,
         )
 
-        # Create the actual storage service bucket
-        try:
-            # Create the bucket in storage service
-            logger.info(f"Creating storage service bucket: {db_bucket.name}")
-            await storage_client.create_bucket(name=db_bucket.name, is_public=db_bucket.is_public)
-            logger.info(f"Successfully created storage service bucket: {db_bucket.name}")
-            
-            # Update bucket visibility if needed
-            if db_bucket.is_public != db_bucket.is_public:  # This is always false, but we'll keep the structure for future updates
-                logger.info(f"Updating bucket visibility for: {db_bucket.name} to public={db_bucket.is_public}")
-                await storage_client.update_bucket(bucket_name=db_bucket.name, is_public=db_bucket.is_public)
-            
-            await emit_table_notification(
-                db, 
-                "buckets", 
-                "INSERT", 
-                jsonable_encoder(db_bucket)
-            )
-            
-            return db_bucket
-            
-        except Exception as e:
+        if isinstance(db_result, BaseException):
+            # Remove the storage service bucket if it was created, then report the database error.
+            # The storage service refuses to create a bucket that already exists, so this
+            # only ever removes the one created above.
+            if not isinstance(storage_result, BaseException):
+                try:
+                    await storage_client.delete_bucket(bucket_in.name)
+                except Exception as e:
+                    logger.error(f"Error removing storage service bucket {bucket_in.name}: {str(e)}")
+            raise db_result
+
+        db_bucket = db_result
+        if isinstance(storage_result, BaseException):
             # If we can't create the bucket in storage service, delete the database record
-            logger.error(f"Error creating storage service bucket {db_bucket.name}: {str(e)}")
+            logger.error(f"Error creating storage service bucket {db_bucket.name}: {str(storage_result)}")
             await delete_bucket(db, db_bucket.id)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Storage service error: {str(e)}",
+                detail=f"Storage service error: {str(storage_result)}",
             )
 
+        logger.info(f"Successfully created storage service bucket: {db_bucket.name}")
+        invalidate_public_buckets_cache()
+
+        await emit_table_notification(
+            db, 
+            "buckets", 
+            "INSERT", 
+            db_bucket
+        )
+
+        return db_bucket
+
     except ValueError as e:
         # Handle validation errors from the create_bucket function
         logger.warning(f"Validation error creating bucket: {str(e)}")
@@ -167,54 +231,32 @@ async def create_bucket_endpoint(
 async def get_bucket_endpoint(
     bucket_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
 ) -> Any:
     """
     Get a specific bucket by ID.
     Authenticated users can access any bucket.
     Anonymous users (with ANON_KEY) can only access public buckets.
     """
-    bucket = await get_bucket(db, bucket_id=bucket_id)
+    # The bucket row and its stats come back from a single query
+    bucket = await get_bucket_with_stats(db, bucket_id=bucket_id)
     if not bucket:
         raise HTTPException(status_code=404, detail="Bucket not found")
+    _ensure_bucket_visible(requester, bucket["is_public"])
 
-    # Check permissions
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-
-    if not is_authenticated_user and not is_anon_request:
-        # No authentication provided
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication required",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
-
-    # Anonymous users can only access public buckets
-    if is_anon_request and not bucket.is_public:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="This bucket is not public"
-        )
-
-    # Get bucket stats
-    stats = await get_bucket_stats(db, bucket.id)
-    bucket_dict = Bucket.model_validate(bucket).model_dump()
-    bucket_dict.update(stats)
-
-    return bucket_dict
+    return ORJSONResponse(content=BucketWithStats.from_row(bucket).model_dump(mode="json"))
 
 @router.put("/{bucket_id}", response_model=Bucket)
 async def update_bucket_endpoint(
     bucket_id: uuid.UUID,
     bucket_in: BucketUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: UserCtx = Depends(get_current_user_ctx),
 ) -> Any:
     """
     Update a bucket.
     """
-    bucket = await get_bucket(db, bucket_id=bucket_id)
+    bucket = await get_bucket_owner(db, bucket_id=bucket_id)
     if not bucket:
         raise HTTPException(status_code=404, detail="Bucket not found")
 
@@ -223,12 +265,13 @@ async def update_bucket_endpoint(
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     updated_bucket = await update_bucket(db, bucket_id=bucket_id, bucket_in=bucket_in)
+    invalidate_public_buckets_cache()
     
     await emit_table_notification(
         db, 
         "buckets", 
         "UPDATE", 
-        jsonable_encoder(updated_bucket)
+        updated_bucket
     )
     
     return updated_bucket
@@ -237,8 +280,8 @@ async def update_bucket_endpoint(
 async def delete_bucket_endpoint(
     bucket_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-    storage_client: StorageServiceClient = Depends(get_storage_service_client),
+    current_user: UserCtx = Depends(get_current_user_ctx),
+    storage_client: StorageServiceClient = Depends(get_storage_service_client_for_ctx),
 ) -> Any:
     """
     Delete a bucket and all its contents.
@@ -252,28 +295,17 @@ async def delete_bucket_endpoint(
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
     try:
-        # First, try to check if the storage service bucket exists
+        # Delete the bucket from storage service (this will delete all files in the bucket).
+        # The storage service answers 404 for a missing bucket, so there is no
+        # separate existence check; the database record is deleted either way.
+        logger.info(f"Deleting bucket {bucket.name} from storage service")
         try:
-            await storage_client.get_bucket(bucket.name)
-        except Exception as e:
-            # If the storage service bucket doesn't exist, just delete the database record
+            await storage_client.delete_bucket(bucket.name)
+            logger.info(f"Successfully deleted bucket {bucket.name} from storage service")
+        except HTTPException as e:
+            if e.status_code != status.HTTP_404_NOT_FOUND:
+                raise
             logger.warning(f"Storage service bucket {bucket.name} not found, deleting database record only")
-            
-            await emit_table_notification(
-                db, 
-                "buckets", 
-                "DELETE", 
-                None, 
-                jsonable_encoder(bucket)
-            )
-            
-            result = await delete_bucket(db, bucket_id=bucket_id)
-            return result
-
-        # Delete the bucket from storage service (this will delete all files in the bucket)
-        logger.info(f"Deleting bucket {bucket.name} from storage service")
-        await storage_client.delete_bucket(bucket.name)
-        logger.info(f"Successfully deleted bucket {bucket.name} from storage service")
 
         # Delete the bucket from the database
         # This will cascade delete all file records associated with this bucket
@@ -284,10 +316,11 @@ async def delete_bucket_endpoint(
             "buckets", 
             "DELETE", 
             None, 
-            jsonable_encoder(bucket)
+            bucket
         )
         
         result = await delete_bucket(db, bucket_id=bucket_id)
+        invalidate_public_buckets_cache()
         return result
     except Exception as e:
         logger.error(f"Storage service error deleting bucket {bucket.name}: {str(e)}")
@@ -306,37 +339,22 @@ async def delete_bucket_endpoint(
 async def get_bucket_files(
     bucket_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> Any:
     """
-    Get all files in a specific bucket.
+    Get all files in a specific bucket, newest first.
     Authenticated users can access files in any bucket.
     Anonymous users (with ANON_KEY) can only access files in public buckets.
+    Pass the X-Next-Cursor header of a full page as `cursor` to fetch the next one.
     """
-    bucket = await get_bucket(db, bucket_id=bucket_id)
+    after = parse_cursor(cursor)
+    bucket = await get_bucket_owner(db, bucket_id=bucket_id)
     if not bucket:
         raise HTTPException(status_code=404, detail="Bucket not found")
+    _ensure_bucket_visible(requester, bucket.is_public)
 
-    # Check permissions
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-
-    if not is_authenticated_user and not is_anon_request:
-        # No authentication provided
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Authentication required",
-            headers={"WWW-Authenticate": "Bearer"}
-        )
-
-    # Anonymous users can only access public buckets
-    if is_anon_request and not bucket.is_public:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="This bucket is not public"
-        )
-
-    files = await get_files_by_bucket(db, bucket_id=bucket_id, skip=skip, limit=limit)
-    return files
+    files = await get_files_by_bucket_light(db, bucket_id=bucket_id, skip=skip, limit=limit, after=after)
+    return json_list_response(_file_adapter, files, next_cursor_headers(files, limit))
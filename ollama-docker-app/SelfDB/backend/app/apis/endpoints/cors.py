@@ -1,10 +1,14 @@
 """API endpoints for CORS origin management."""
 
-from typing import List
+from typing import Any, Dict, List, Tuple
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from ...schemas.cors import (
     CorsOrigin,
@@ -21,6 +25,31 @@ from ..deps import get_db, get_current_active_superuser
 
 router = APIRouter()
 
+# Validates and dumps the whole origin list in one pass
+_origin_list_adapter = TypeAdapter(List[CorsOrigin])
+
+# Dumped origin lists keyed by (active_only, version). Every write bumps
+# the version after it commits, so a list read concurrently with a write is
+# stored under the old version and never served again.
+_origins_cache: Dict[Tuple[bool, int], Dict[str, Any]] = {}
+_origins_cache_version = 0
+
+# Set on a session's info by the write endpoints; get_db commits the request's
+# transaction, and the cache is invalidated once that commit has happened.
+_ORIGINS_CHANGED = "cors_origins_changed"
+
+
+def _invalidate_origins_cache() -> None:
+    global _origins_cache_version
+    _origins_cache_version += 1
+    _origins_cache.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_origins_cache_after_commit(session: Session) -> None:
+    if session.info.pop(_ORIGINS_CHANGED, False):
+        _invalidate_origins_cache()
+
 
 @router.get("/", response_model=CorsOriginsList)
 async def list_cors_origins(
@@ -28,16 +57,23 @@ async def list_cors_origins(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_superuser),
     active_only: bool = True,
-) -> CorsOriginsList:
+) -> ORJSONResponse:
     """
     List all CORS origins.
     Requires superuser privileges.
     """
-    origins = await CorsService.list_origins(db, active_only=active_only)
-    return CorsOriginsList(
-        origins=[CorsOrigin.model_validate(origin) for origin in origins],
-        total_count=len(origins)
-    )
+    cache_key = (active_only, _origins_cache_version)
+    content = _origins_cache.get(cache_key)
+    if content is None:
+        origins = await CorsService.list_origins(db, active_only=active_only)
+        content = {
+            "origins": _origin_list_adapter.dump_python(
+                _origin_list_adapter.validate_python(origins, from_attributes=True), mode="json"
+            ),
+            "total_count": len(origins)
+        }
+        _origins_cache[cache_key] = content
+    return ORJSONResponse(content=content)
 
 
 @router.post("/", response_model=CorsOrigin, status_code=status.HTTP_201_CREATED)
@@ -52,7 +88,7 @@ async def create_cors_origin(
     Requires superuser privileges.
     """
     origin = await CorsService.create_origin(db, origin_data, current_user)
-    await db.commit()
+    db.info[_ORIGINS_CHANGED] = True
     return CorsOrigin.model_validate(origin)
 
 
@@ -89,7 +125,7 @@ async def update_cors_origin(
     Requires superuser privileges.
     """
     origin = await CorsService.update_origin(db, str(origin_id), origin_data, current_user)
-    await db.commit()
+    db.info[_ORIGINS_CHANGED] = True
     return CorsOrigin.model_validate(origin)
 
 
@@ -118,7 +154,7 @@ async def delete_cors_origin(
             detail="Origin not found"
         )
     
-    await db.commit()
+    db.info[_ORIGINS_CHANGED] = True
 
 
 @router.post("/validate", response_model=CorsOriginValidation)
@@ -151,5 +187,6 @@ async def refresh_cors_cache_endpoint(
     Useful for testing or troubleshooting.
     Requires superuser privileges.
     """
+    _invalidate_origins_cache()
     await refresh_cors_cache()
     return {"message": "CORS origins cache refreshed successfully"}
\ No newline at end of file
@@ -1,20 +1,32 @@
-from typing import Any, List, Optional, Union, Literal
+from typing import Any, AsyncIterator, List, Optional, Union, Literal
+import asyncio
+import mimetypes
+import os
+import secrets
 import uuid
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import RedirectResponse
+from types import MappingProxyType
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status, Query
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import BaseModel, HttpUrl, Field as PydanticField
+from pydantic import BaseModel, HttpUrl, TypeAdapter, Field as PydanticField
 
-from ...db.notify import emit_table_notification
-from ...core.config import settings
+from ...db.notify import enqueue_bucket_update
+from ...db.session import AsyncSessionLocal
 
 from ...schemas.file import File, FileCreate
 from ...models.user import User
-from ...crud.file import get_file, get_files_by_owner, get_files_by_bucket, create_file, delete_file
-from ...crud.bucket import get_bucket
-from ..deps import get_db, get_current_active_user, get_current_user_or_anon, ANON_USER_ROLE
-from ..deps_storage import get_storage_service_client, get_storage_service_client_anon, StorageServiceClient
+from ...crud.file import get_file, get_accessible_file, get_public_file, get_files_by_owner, get_files_by_bucket, stream_files, create_file, delete_file
+from ...crud.bucket import get_bucket_ref, encode_bucket_cursor
+from ..deps import get_db, get_current_active_user, get_current_user_or_anon, require_user_or_anon, ANON_USER_ROLE
+from ..deps_storage import (
+    get_storage_service_client,
+    get_storage_service_client_anon,
+    get_anon_storage_client,
+    StorageServiceClient,
+)
+from .buckets import invalidate_public_buckets_cache, invalidate_public_buckets_cache_on_commit
+from ..streaming import NEXT_CURSOR_HEADER, parse_cursor, stream_json_rows
 
 # --- Pydantic model definitions (Ideally move to schemas/file.py and import) ---
 class FileUploadInitiateRequest(BaseModel):
@@ -48,7 +60,45 @@ class PresignedUrlRequest(BaseModel):
 # Configure logger
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+# File responses are rendered with orjson rather than the stdlib json module
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Content types for viewable files whose stored type is missing or generic:
+# the stdlib mimetypes table (read once at import), with the types this API
+# has always used for common media taking precedence over it
+_MIME_OVERRIDES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".pdf": "application/pdf",
+    ".mp4": "video/mp4",
+    ".mp3": "audio/mpeg",
+}
+mimetypes.init()
+_EXT_TO_MIME = MappingProxyType({**mimetypes.types_map, **_MIME_OVERRIDES})
+
+def _guess_content_type(filename: str, stored: Optional[str]) -> Optional[str]:
+    """
+    Returns the stored content type, or one guessed from the file extension
+    if none is stored or it is application/octet-stream.
+    """
+    if stored and stored != "application/octet-stream":
+        return stored
+    return _EXT_TO_MIME.get(os.path.splitext(filename)[1].lower(), stored)
+
+async def _get_accessible_file(db: AsyncSession, file_id: uuid.UUID, requester: Union[User, Literal["anon"]]):
+    # The access rule is part of the query, so files the requester may not
+    # see are reported as missing
+    if requester == ANON_USER_ROLE:
+        db_file = await get_accessible_file(db, file_id=file_id)
+    else:
+        db_file = await get_accessible_file(
+            db, file_id=file_id, user_id=requester.id, is_superuser=requester.is_superuser
+        )
+    if not db_file:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return db_file
 
 async def get_conditional_storage_client(
     requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon)
@@ -58,64 +108,76 @@ async def get_conditional_storage_client(
     For authenticated users, returns a client with user token.
     For anonymous users, returns a client with anon key.
     """
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-    
-    if is_authenticated_user:
-        # Generate a JWT token for the authenticated user
-        from jose import jwt
-        import time
-        token_data = {
-            "sub": str(requester.id),
-            "exp": int(time.time() + 3600)  # 1 hour expiry
-        }
-        token = jwt.encode(token_data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-        
-        client = StorageServiceClient(
-            base_url=settings.STORAGE_SERVICE_URL,
-            token=token,
-            anon_key=settings.ANON_KEY
-        )
+    if isinstance(requester, User):
+        client = await get_storage_service_client(requester)
     else:
         # For anonymous users or no authentication
-        client = StorageServiceClient(
-            base_url=settings.STORAGE_SERVICE_URL,
-            anon_key=settings.ANON_KEY
-        )
+        client = get_anon_storage_client()
     
     return client
 
+# Listings with a larger limit are streamed straight from a database cursor,
+# so neither the rows nor the JSON body are ever held in memory as a whole
+STREAM_FILES_LIMIT = 500
+_file_adapter = TypeAdapter(File)
+
+async def _stream_files_json(**page: Any) -> AsyncIterator[bytes]:
+    # The rows are read through a session of the stream's own
+    async with AsyncSessionLocal() as session:
+        async for chunk in stream_json_rows(_file_adapter, stream_files(session, **page)):
+            yield chunk
+
 @router.get("", response_model=List[File])
 async def list_files(
+    response: Response,
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     bucket_id: Optional[uuid.UUID] = Query(None, description="Filter files by bucket ID"),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """
-    Retrieve files for the current user, optionally filtered by bucket.
+    Retrieve files for the current user, optionally filtered by bucket, newest first.
+    Pass the X-Next-Cursor header of a full page as `cursor` to fetch the next one.
+    Pages with a limit above STREAM_FILES_LIMIT are streamed as they are read
+    and carry no X-Next-Cursor header.
     """
+    after = parse_cursor(cursor)
+
     if bucket_id:
         # Check if the bucket exists and belongs to the user
-        bucket = await get_bucket(db, bucket_id=bucket_id)
+        bucket = await get_bucket_ref(db, bucket_id=bucket_id)
         if not bucket or (bucket.owner_id != current_user.id and not current_user.is_superuser):
             raise HTTPException(status_code=404, detail="Bucket not found")
 
+    if limit > STREAM_FILES_LIMIT:
+        page = {"skip": skip, "limit": limit, "after": after}
+        if bucket_id:
+            page["bucket_id"] = bucket_id
+        else:
+            page["owner_id"] = current_user.id
+        return StreamingResponse(_stream_files_json(**page), media_type="application/json")
+
+    if bucket_id:
         # Get files from the specified bucket
-        files = await get_files_by_bucket(db, bucket_id=bucket_id, skip=skip, limit=limit)
+        files = await get_files_by_bucket(db, bucket_id=bucket_id, skip=skip, limit=limit, after=after)
     else:
         # Get all files for the user
-        files = await get_files_by_owner(db, owner_id=current_user.id, skip=skip, limit=limit)
+        files = await get_files_by_owner(db, owner_id=current_user.id, skip=skip, limit=limit, after=after)
 
+    # Like the bucket listings, the cursor travels in a header (only on full pages)
+    if files and len(files) == limit and files[-1].created_at is not None:
+        response.headers[NEXT_CURSOR_HEADER] = encode_bucket_cursor(files[-1].created_at, files[-1].id)
     return files
 
 @router.post("/initiate-upload", response_model=FileUploadInitiateResponse, status_code=status.HTTP_201_CREATED)
 async def initiate_file_upload(
     *,
     db: AsyncSession = Depends(get_db),
+    background_tasks: BackgroundTasks,
     upload_request: FileUploadInitiateRequest, # New request body
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
     storage_client: StorageServiceClient = Depends(get_conditional_storage_client),
 ) -> Any:
     """
@@ -124,20 +186,13 @@ async def initiate_file_upload(
     for the client to upload the file directly to the storage service.
     """
     try:
+        # require_user_or_anon has already rejected unauthenticated requests
         is_anon_request = requester == ANON_USER_ROLE
-        is_authenticated_user = isinstance(requester, User)
-
-        if not is_authenticated_user and not is_anon_request:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authentication required",
-                headers={"WWW-Authenticate": "Bearer"}
-            )
 
         bucket_id = upload_request.bucket_id
-        db_bucket = await get_bucket(db, bucket_id=bucket_id)
+        db_bucket = await get_bucket_ref(db, bucket_id=bucket_id)
         if not db_bucket:
-            logger.warning(f"Upload initiation for invalid bucket_id {bucket_id}")
+            logger.warning("Upload initiation for invalid bucket_id %s", bucket_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Bucket not found"
@@ -146,22 +201,21 @@ async def initiate_file_upload(
         # Permission check for bucket (simplified, adjust as per your app's logic)
         if is_anon_request:
             # For open-discussion-board sample app, allow anonymous users to upload to any bucket
-            logger.info(f"Anonymous user initiating upload to bucket {db_bucket.name}")
-        elif is_authenticated_user:
+            logger.info("Anonymous user initiating upload to bucket %s", db_bucket.name)
+        else:
             if db_bucket.owner_id != requester.id and not requester.is_superuser:
                  # More fine-grained: check if bucket is public if allowing uploads to public buckets by any auth user
                 if not db_bucket.is_public: # Example: only owner or superuser can upload to private bucket
                     raise HTTPException(status_code=403, detail="Permission denied for this bucket")
-            logger.info(f"User {requester.id} initiating upload to bucket {db_bucket.name}")
+            logger.info("User %s initiating upload to bucket %s", requester.id, db_bucket.name)
         
-        # Generate a unique object name for storage. Using UUID to avoid collisions.
+        # Generate a unique object name for storage. 128 random bits avoid collisions
+        # as a UUID would, in 22 URL-safe characters instead of 36.
         # You might want a more structured naming convention, e.g., user_id/bucket_id/uuid/filename
-        file_extension = ""
-        if '.' in upload_request.filename:
-            file_extension = "." + upload_request.filename.rsplit('.', 1)[1]
-        object_name_in_storage = f"{uuid.uuid4()}{file_extension}" # Example: "random-uuid.jpg"
+        file_extension = os.path.splitext(upload_request.filename)[1] # Includes the dot, "" if none
+        object_name_in_storage = f"{secrets.token_urlsafe(16)}{file_extension}" # Example: "Xq3...9w.jpg"
 
-        owner_id = requester.id if is_authenticated_user else db_bucket.owner_id
+        owner_id = db_bucket.owner_id if is_anon_request else requester.id
 
         file_in_db = FileCreate(
             filename=upload_request.filename,
@@ -172,47 +226,50 @@ async def initiate_file_upload(
             owner_id=owner_id,
             bucket_id=bucket_id,
         )
-        db_file = await create_file(db, file_in=file_in_db)
-        logger.info(f"Created file record (ID: {db_file.id}) for {object_name_in_storage} in bucket {db_bucket.name}")
-
-        # Get pre-signed URL from storage service
-        try:
-            presigned_data = await storage_client.generate_presigned_upload_url(
+        # The record and the pre-signed URL only share the object name, so the
+        # INSERT and the storage service round trip run concurrently. The row
+        # is only flushed: get_db commits it once the request succeeds and
+        # rolls it back if anything below raises.
+        db_result, presign_result = await asyncio.gather(
+            create_file(db, file_in=file_in_db, commit=False),
+            storage_client.generate_presigned_upload_url(
                 bucket_name=db_bucket.name,
                 object_name=object_name_in_storage,
                 content_type=upload_request.content_type
                 # expires_in_seconds can be customized if needed
-            )
-        except HTTPException as e: # Catch HTTPExceptions from storage client
-            logger.error(f"Storage service error generating presigned URL: {e.detail}")
-            # Attempt to clean up the created DB record if presigned URL generation fails
-            await delete_file(db, file_id=db_file.id) # This might need adjustment if delete_file expects storage deletion too
-            logger.warning(f"Rolled back file record {db_file.id} due to presigned URL generation failure.")
-            raise # Re-raise the HTTPException
-        except Exception as e:
-            logger.error(f"Failed to generate presigned URL for {object_name_in_storage}: {str(e)}")
-            await delete_file(db, file_id=db_file.id)
-            logger.warning(f"Rolled back file record {db_file.id} due to presigned URL generation failure.")
+            ),
+            return_exceptions=True,
+        )
+        if isinstance(db_result, BaseException):
+            # An unused pre-signed URL simply expires, so there is nothing to undo
+            raise db_result
+
+        db_file = db_result
+        logger.info("Created file record (ID: %s) for %s in bucket %s", db_file.id, object_name_in_storage, db_bucket.name)
+
+        if isinstance(presign_result, BaseException):
+            # Raising rolls back the uncommitted DB record, with no DELETE needed
+            if isinstance(presign_result, HTTPException): # HTTPExceptions from storage client
+                logger.error("Storage service error generating presigned URL: %s", presign_result.detail)
+            else:
+                logger.error("Failed to generate presigned URL for %s: %s", object_name_in_storage, presign_result)
+            logger.warning("Rolling back file record %s due to presigned URL generation failure.", db_file.id)
+            if isinstance(presign_result, HTTPException):
+                raise presign_result # Re-raise the HTTPException
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Could not generate upload URL: {str(e)}"
+                detail=f"Could not generate upload URL: {str(presign_result)}"
             )
+        presigned_data = presign_result
+        # The file row is committed by get_db after this handler returns
+        invalidate_public_buckets_cache_on_commit(db)
         
-        # Note: After client uploads, you might need a separate "finalize" or "confirm" endpoint
-        # that the client calls. This endpoint could verify the upload with the storage service
-        # and update the file's status/size in the DB if needed.
-        # For simplicity, we assume the client upload will succeed.
-        # The `emit_table_notification` for bucket stats would ideally be after successful upload confirmation.
-        # For now, we emit it here, or it can be moved to a confirmation step.
-        await emit_table_notification(
-            db=db,
-            table_name="buckets",
-            operation="UPDATE",
-            data={"id": str(bucket_id), "total_size_updated": True} # This might be premature if size is not confirmed
-        )
+        # Queued once the response is out, after the file record is committed,
+        # and coalesced with other updates to the same bucket (see enqueue_bucket_update)
+        background_tasks.add_task(enqueue_bucket_update, bucket_id)
 
         return FileUploadInitiateResponse(
-            file_metadata=File.from_orm(db_file), # Ensure File schema can be created from ORM object
+            file_metadata=File.model_validate(db_file),
             presigned_upload_info=PresignedUploadInfo(
                 upload_url=presigned_data["upload_url"],
                 upload_method=presigned_data["method"]
@@ -223,7 +280,7 @@ async def initiate_file_upload(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Unexpected error initiating file upload: {str(e)}", exc_info=True)
+        logger.error("Unexpected error initiating file upload: %s", e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error initiating file upload: {str(e)}",
@@ -233,7 +290,7 @@ async def initiate_file_upload(
 async def get_file_download_info(
     file_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
     storage_client: StorageServiceClient = Depends(get_conditional_storage_client),
 ) -> Any:
     """
@@ -242,33 +299,7 @@ async def get_file_download_info(
     Authentication/authorization for the URL itself is handled by the storage service
     (e.g., via Bearer token in request to storage, or if URL is inherently public).
     """
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-
-    if not is_authenticated_user and not is_anon_request:
-        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Authentication required")
-
-    db_file = await get_file(db, file_id=file_id)
-    if not db_file:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-
-    db_bucket = await get_bucket(db, bucket_id=db_file.bucket_id)
-    if not db_bucket:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Associated bucket not found")
-
-    # Permission check
-    can_access = False
-    if is_authenticated_user:
-        if db_file.owner_id == requester.id or db_bucket.is_public or requester.is_superuser:
-            can_access = True
-    elif is_anon_request:
-        if db_bucket.is_public: # Anonymous can only access public bucket files
-            can_access = True
-        # Special case for open-discussion-board (if still needed here)
-        # elif "open-discussion-board" in some_context: can_access = True
-
-    if not can_access:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to this file")
+    db_file = await _get_accessible_file(db, file_id, requester)
     
     # Ensure db_file.object_name is the actual key in storage (no bucket prefix)
     # The create_file logic should ensure this. If legacy data exists, sanitize here or in CRUD.
@@ -285,11 +316,11 @@ async def get_file_download_info(
             object_name=object_name_in_storage,
         )
         return FileDownloadInfoResponse(
-            file_metadata=File.from_orm(db_file),
+            file_metadata=File.model_validate(db_file),
             download_url=download_url
         )
     except Exception as e:
-        logger.error(f"Error generating file download URL for {file_id}: {str(e)}", exc_info=True)
+        logger.error("Error generating file download URL for %s: %s", file_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate download URL"
@@ -299,7 +330,7 @@ async def get_file_download_info(
 async def get_file_view_info(
     file_id: uuid.UUID,
     db: AsyncSession = Depends(get_db),
-    requester: Union[User, Literal["anon"], None] = Depends(get_current_user_or_anon),
+    requester: Union[User, Literal["anon"]] = Depends(require_user_or_anon),
     storage_client: StorageServiceClient = Depends(get_conditional_storage_client),
 ) -> Any:
     """
@@ -307,55 +338,15 @@ async def get_file_view_info(
     Client uses this URL to view the file directly from storage.
     Authentication/authorization for the URL itself is handled by the storage service.
     """
-    is_anon_request = requester == ANON_USER_ROLE
-    is_authenticated_user = isinstance(requester, User)
-
-    if not is_authenticated_user and not is_anon_request:
-        raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Authentication required")
-
-    db_file = await get_file(db, file_id=file_id)
-    if not db_file:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-
-    db_bucket = await get_bucket(db, bucket_id=db_file.bucket_id)
-    if not db_bucket:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Associated bucket not found")
-
-    # Permission check
-    can_access = False
-    if is_authenticated_user:
-        if db_file.owner_id == requester.id or db_bucket.is_public or requester.is_superuser:
-            can_access = True
-    elif is_anon_request:
-        if db_bucket.is_public: # Anonymous can only access public bucket files
-            can_access = True
-
-    if not can_access:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to this file")
+    db_file = await _get_accessible_file(db, file_id, requester)
     
     object_name_in_storage = db_file.object_name 
 
     try:
         # Determine content type
-        content_type = db_file.content_type
-        
-        # If no content type is stored or it's application/octet-stream, try to guess from extension
-        if not content_type or content_type == "application/octet-stream":
-            filename = db_file.filename
-            if filename.lower().endswith('.png'):
-                content_type = 'image/png'
-            elif filename.lower().endswith(('.jpg', '.jpeg')):
-                content_type = 'image/jpeg'
-            elif filename.lower().endswith('.gif'):
-                content_type = 'image/gif'
-            elif filename.lower().endswith('.pdf'):
-                content_type = 'application/pdf'
-            elif filename.lower().endswith('.mp4'):
-                content_type = 'video/mp4'
-            elif filename.lower().endswith('.mp3'):
-                content_type = 'audio/mpeg'
-
-        logger.info(f"Generating view URL for file {file_id} with content_type: {content_type}")
+        content_type = _guess_content_type(db_file.filename, db_file.content_type)
+
+        logger.info("Generating view URL for file %s with content_type: %s", file_id, content_type)
         
         view_url = await storage_client.get_direct_view_url(
             bucket_name=db_file.bucket_name,
@@ -363,11 +354,11 @@ async def get_file_view_info(
             content_type=content_type
         )
         return FileViewInfoResponse(
-            file_metadata=File.from_orm(db_file),
+            file_metadata=File.model_validate(db_file),
             view_url=view_url
         )
     except Exception as e:
-        logger.error(f"Error generating file view URL for {file_id}: {str(e)}", exc_info=True)
+        logger.error("Error generating file view URL for %s: %s", file_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate view URL"
@@ -382,18 +373,13 @@ async def public_get_file_download_info(
     """
     Public endpoint to get file metadata and a direct download URL for files in public buckets.
     """
-    db_file = await get_file(db, file_id=file_id)
+    # The public-bucket check is part of the query; files that are not
+    # publicly visible are reported as missing
+    db_file = await get_public_file(db, file_id=file_id)
     if not db_file:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
-
-    if not db_file.bucket_id:
-         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="File is not in a bucket, cannot be public.")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found in a public bucket")
 
-    db_bucket = await get_bucket(db, bucket_id=db_file.bucket_id)
-    if not db_bucket or not db_bucket.is_public:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="File is not in a public bucket.")
-
-    logger.info(f"Public access request for file {file_id} in public bucket {db_bucket.name}")
+    logger.info("Public access request for file %s in public bucket %s", file_id, db_file.bucket_name)
 
     object_name_in_storage = db_file.object_name # Assuming this is the correct key
 
@@ -403,11 +389,11 @@ async def public_get_file_download_info(
             object_name=object_name_in_storage,
         )
         return FileDownloadInfoResponse(
-            file_metadata=File.from_orm(db_file),
+            file_metadata=File.model_validate(db_file),
             download_url=download_url
         )
     except Exception as e:
-        logger.error(f"Error generating public download URL for {file_id}: {str(e)}", exc_info=True)
+        logger.error("Error generating public download URL for %s: %s", file_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate public download URL"
@@ -422,42 +408,21 @@ async def public_get_file_view_info(
     """
     Public endpoint to get file metadata and a direct view URL for files in public buckets.
     """
-    db_file = await get_file(db, file_id=file_id)
+    # The public-bucket check is part of the query; files that are not
+    # publicly visible are reported as missing
+    db_file = await get_public_file(db, file_id=file_id)
     if not db_file:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found in a public bucket")
 
-    if not db_file.bucket_id:
-         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="File is not in a bucket, cannot be public.")
-
-    db_bucket = await get_bucket(db, bucket_id=db_file.bucket_id)
-    if not db_bucket or not db_bucket.is_public:
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="File is not in a public bucket.")
-
-    logger.info(f"Public access request for file {file_id} in public bucket {db_bucket.name}")
+    logger.info("Public access request for file %s in public bucket %s", file_id, db_file.bucket_name)
 
     object_name_in_storage = db_file.object_name # Assuming this is the correct key
 
     try:
         # Determine content type
-        content_type = db_file.content_type
-        
-        # If no content type is stored or it's application/octet-stream, try to guess from extension
-        if not content_type or content_type == "application/octet-stream":
-            filename = db_file.filename
-            if filename.lower().endswith('.png'):
-                content_type = 'image/png'
-            elif filename.lower().endswith(('.jpg', '.jpeg')):
-                content_type = 'image/jpeg'
-            elif filename.lower().endswith('.gif'):
-                content_type = 'image/gif'
-            elif filename.lower().endswith('.pdf'):
-                content_type = 'application/pdf'
-            elif filename.lower().endswith('.mp4'):
-                content_type = 'video/mp4'
-            elif filename.lower().endswith('.mp3'):
-                content_type = 'audio/mpeg'
-
-        logger.info(f"Generating public view URL for file {file_id} with content_type: {content_type}")
+        content_type = _guess_content_type(db_file.filename, db_file.content_type)
+
+        logger.info("Generating public view URL for file %s with content_type: %s", file_id, content_type)
         
         view_url = await storage_client.get_direct_view_url(
             bucket_name=db_file.bucket_name,
@@ -465,11 +430,11 @@ async def public_get_file_view_info(
             content_type=content_type
         )
         return FileViewInfoResponse(
-            file_metadata=File.from_orm(db_file),
+            file_metadata=File.model_validate(db_file),
             view_url=view_url
         )
     except Exception as e:
-        logger.error(f"Error generating public view URL for {file_id}: {str(e)}", exc_info=True)
+        logger.error("Error generating public view URL for %s: %s", file_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate public view URL"
@@ -478,6 +443,7 @@ async def public_get_file_view_info(
 @router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT) # Return 204 on successful delete
 async def delete_file_endpoint(
     file_id: uuid.UUID,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     storage_client: StorageServiceClient = Depends(get_storage_service_client),
@@ -504,26 +470,25 @@ async def delete_file_endpoint(
             bucket_name=db_file.bucket_name,
             object_name=object_name_in_storage, # Changed from 'filename' to 'object_name'
         )
-        logger.info(f"Successfully deleted file {object_name_in_storage} from storage service bucket {db_file.bucket_name}")
+        logger.info("Successfully deleted file %s from storage service bucket %s", object_name_in_storage, db_file.bucket_name)
 
         await delete_file(db, file_id=file_id) # This is the DB delete
-        logger.info(f"Successfully deleted file record {file_id} from database.")
+        invalidate_public_buckets_cache()
+        logger.info("Successfully deleted file record %s from database.", file_id)
 
 
-        await emit_table_notification(
-            db=db,
-            table_name="buckets",
-            operation="UPDATE",
-            data={"id": str(db_file.bucket_id), "total_size_updated": True}
-        )
-        logger.info(f"Emitted notification to buckets_changes for bucket ID {db_file.bucket_id} after file deletion.")
+        # Queued once the response is out, after the delete is committed, and
+        # coalesced with other updates to the same bucket
+        if db_file.bucket_id:
+            background_tasks.add_task(enqueue_bucket_update, db_file.bucket_id)
+        logger.info("Queued notification to buckets_changes for bucket ID %s after file deletion.", db_file.bucket_id)
 
         # No explicit return for 204
     except HTTPException as e: # Re-raise HTTPExceptions from storage_client or auth
-        logger.error(f"HTTPException during file deletion {file_id}: {e.detail}")
+        logger.error("HTTPException during file deletion %s: %s", file_id, e.detail)
         raise
     except Exception as e:
-        logger.error(f"Error deleting file {file_id}: {str(e)}", exc_info=True)
+        logger.error("Error deleting file %s: %s", file_id, e, exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting file: {str(e)}",
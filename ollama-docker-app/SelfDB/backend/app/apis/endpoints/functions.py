@@ -1,10 +1,14 @@
-from typing import Any, List
+from typing import Any, AsyncIterator, List
 from uuid import UUID
+import hashlib
 import json
 
-from fastapi import APIRouter, Depends, HTTPException, status, Path, Response
+import orjson
+
+from fastapi import APIRouter, Depends, HTTPException, status, Path, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.encoders import jsonable_encoder
 
 from ...schemas.function import (
     Function,
@@ -16,22 +20,53 @@ from ...schemas.function import (
 )
 from ...models.user import User
 from ...crud.function import (
-    get_function,
-    get_functions_by_owner,
+    get_function_for_user,
+    stream_functions_by_owner,
     create_function,
     update_function,
     delete_function,
     list_env_vars,
+    get_env_var,
     create_env_var,
     update_env_var,
     delete_env_var,
-    get_versions,
+    stream_versions,
 )
 from ..deps import get_db, get_current_active_user
 from ...db.notify import emit_table_notification
+from ...db.session import AsyncSessionLocal
+from ..streaming import stream_json_rows
 
 router = APIRouter()
 
+# Function and version listings are streamed straight from a database
+# cursor, so neither the rows nor the JSON body are held in memory as a whole
+_function_adapter = TypeAdapter(Function)
+_function_version_adapter = TypeAdapter(FunctionVersion)
+
+
+async def _stream_functions_json(**page: Any) -> AsyncIterator[bytes]:
+    # The rows are read through a session of the stream's own
+    async with AsyncSessionLocal() as session:
+        async for chunk in stream_json_rows(_function_adapter, stream_functions_by_owner(session, **page)):
+            yield chunk
+
+
+async def _stream_versions_json(function_id: UUID) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as session:
+        async for chunk in stream_json_rows(_function_version_adapter, stream_versions(session, function_id=function_id)):
+            yield chunk
+
+
+async def _get_owned_function(db: AsyncSession, function_id: UUID, current_user: User):
+    # Functions the user may not manage are reported as missing
+    fn = await get_function_for_user(
+        db, function_id=function_id, user_id=current_user.id, is_superuser=current_user.is_superuser
+    )
+    if not fn:
+        raise HTTPException(status_code=404, detail="Function not found")
+    return fn
+
 # ---------------------------------------------------------
 # Function CRUD Endpoints
 # ---------------------------------------------------------
@@ -46,8 +81,10 @@ async def list_user_functions(
 ) -> Any:
     """List all functions owned by the authenticated user."""
     # TODO: support superuser listing all
-    functions = await get_functions_by_owner(db, owner_id=current_user.id, skip=skip, limit=limit)
-    return functions
+    return StreamingResponse(
+        _stream_functions_json(owner_id=current_user.id, skip=skip, limit=limit),
+        media_type="application/json",
+    )
 
 
 @router.post("", response_model=Function, status_code=status.HTTP_201_CREATED)
@@ -64,7 +101,7 @@ async def create_user_function(
         db, 
         "functions", 
         "INSERT", 
-        jsonable_encoder(fn)
+        fn
     )
     
     return fn
@@ -77,11 +114,7 @@ async def read_function(
     current_user: User = Depends(get_current_active_user),
     function_id: UUID = Path(..., description="Function ID"),
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
     return fn
 
 
@@ -93,11 +126,7 @@ async def update_user_function(
     function_id: UUID,
     obj_in: FunctionUpdate,
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
     fn = await update_function(db, function=fn, obj_in=obj_in, updated_by=current_user.id)
     
@@ -105,7 +134,7 @@ async def update_user_function(
         db, 
         "functions", 
         "UPDATE", 
-        jsonable_encoder(fn)
+        fn
     )
     
     return fn
@@ -118,18 +147,14 @@ async def delete_user_function(
     current_user: User = Depends(get_current_active_user),
     function_id: UUID,
 ) -> None:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
     
     await emit_table_notification(
         db, 
         "functions", 
         "DELETE", 
         None, 
-        jsonable_encoder(fn)
+        fn
     )
     
     await delete_function(db, function=fn)
@@ -146,14 +171,9 @@ async def list_function_versions(
     current_user: User = Depends(get_current_active_user),
     function_id: UUID,
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
-    versions = await get_versions(db, function_id=function_id)
-    return versions
+    return StreamingResponse(_stream_versions_json(function_id), media_type="application/json")
 
 
 # ---------------------------------------------------------
@@ -167,11 +187,7 @@ async def list_function_env_vars(
     current_user: User = Depends(get_current_active_user),
     function_id: UUID,
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
     return await list_env_vars(db, function_id=function_id)
 
@@ -184,11 +200,7 @@ async def create_function_env_var(
     function_id: UUID,
     var_in: FunctionEnvVarBase,
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
     env_var = await create_env_var(db, function_id=function_id, var_in=var_in)
     
@@ -196,7 +208,7 @@ async def create_function_env_var(
         db, 
         "function_env_vars", 
         "INSERT", 
-        jsonable_encoder(env_var)
+        env_var
     )
     
     return env_var
@@ -211,15 +223,10 @@ async def update_function_env_var(
     env_id: UUID,
     var_in: FunctionEnvVarBase,
 ) -> Any:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
     # Fetch env var
-    env_vars = await list_env_vars(db, function_id=function_id)
-    env_obj = next((v for v in env_vars if v.id == env_id), None)
+    env_obj = await get_env_var(db, function_id=function_id, env_id=env_id)
     if not env_obj:
         raise HTTPException(status_code=404, detail="Environment variable not found")
 
@@ -229,7 +236,7 @@ async def update_function_env_var(
         db, 
         "function_env_vars", 
         "UPDATE", 
-        jsonable_encoder(updated_env_var)
+        updated_env_var
     )
     
     return updated_env_var
@@ -243,14 +250,9 @@ async def delete_function_env_var(
     function_id: UUID,
     env_id: UUID,
 ) -> None:
-    fn = await get_function(db, function_id=function_id)
-    if not fn:
-        raise HTTPException(status_code=404, detail="Function not found")
-    if fn.owner_id != current_user.id and not current_user.is_superuser:
-        raise HTTPException(status_code=403, detail="Not enough permissions")
+    fn = await _get_owned_function(db, function_id, current_user)
 
-    env_vars = await list_env_vars(db, function_id=function_id)
-    env_obj = next((v for v in env_vars if v.id == env_id), None)
+    env_obj = await get_env_var(db, function_id=function_id, env_id=env_id)
     if not env_obj:
         raise HTTPException(status_code=404, detail="Environment variable not found")
     
@@ -259,7 +261,7 @@ async def delete_function_env_var(
         "function_env_vars", 
         "DELETE", 
         None, 
-        jsonable_encoder(env_obj)
+        env_obj
     )
     
     await delete_env_var(db, env_var=env_obj)
@@ -292,8 +294,19 @@ export default async function handler(req) {
 }
 
 
+# The template never changes at runtime, so its JSON body and ETag are built
+# once at import time and revalidating clients get a 304
+_TEMPLATE_BODY = orjson.dumps(_TEMPLATES["default"])
+_TEMPLATE_HEADERS = {
+    "ETag": f'"{hashlib.md5(_TEMPLATE_BODY).hexdigest()}"',
+    "Cache-Control": "public, max-age=86400",
+}
+
+
 @router.get("/templates/{template_type}")
-async def get_template_endpoint(template_type: str) -> Any:
+async def get_template_endpoint(template_type: str, request: Request) -> Any:
     # Always return the default template regardless of the requested type
     # This simplifies the function model by removing trigger-specific templates
-    return _TEMPLATES["default"]
+    if request.headers.get("if-none-match") == _TEMPLATE_HEADERS["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_TEMPLATE_HEADERS)
+    return Response(content=_TEMPLATE_BODY, media_type="application/json", headers=_TEMPLATE_HEADERS)
@@ -3,7 +3,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 import logging
 
+from ...core.config import settings
 from ..deps import get_db # Import the DB dependency
+from ...db.session import engine
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -40,3 +42,19 @@ async def db_health_check(db: AsyncSession = Depends(get_db)):
     except Exception as e:
         logger.error(f"Database connection error: {e}", exc_info=True)
         raise HTTPException(status_code=503, detail=f"Database connection error: {e}")
+
+@router.get("/health/db/pool", summary="Inspect Database Connection Pool", status_code=200)
+async def db_pool_status():
+    """
+    Reports live usage of the SQLAlchemy connection pool, to spot requests
+    waiting on connection checkout under load.
+    """
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        # QueuePool reports negative overflow until the base pool is full
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
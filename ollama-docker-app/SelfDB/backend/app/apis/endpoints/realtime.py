@@ -1,17 +1,14 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, List, Any
-import json
+from typing import Dict, List, Any, Optional, Set, Tuple
+import orjson
 import asyncio
 import logging
 import asyncpg
-from jose import jwt, JWTError
 from sqlalchemy import text
 
 from ...core.config import settings
-from ...schemas.token import TokenPayload
-from ...crud.user import get_user_by_email
-from ..deps import get_db
+from ..deps import get_db, _get_user_from_token
 from ...db.session import engine
 
 # Configure logging
@@ -19,75 +16,163 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-db_listeners = {}
-
-async def setup_database_listener(channel: str):
+# All channels are LISTENed on one shared asyncpg connection rather than one
+# connection per channel. _listening_channels is the set of channels that
+# connection should carry; it survives reconnects, which re-add every channel.
+# A watchdog task pings the connection and reopens it when it has dropped.
+LISTENER_HEARTBEAT_SECONDS = 30
+_listener_conn: Optional[asyncpg.Connection] = None
+_listening_channels: Set[str] = set()
+_listener_lock = asyncio.Lock()
+_listener_watchdog: Optional[asyncio.Task] = None
+
+def _dumps(obj: Any) -> str:
+    # WebSocket messages go out as text frames, so orjson's bytes are decoded
+    return orjson.dumps(obj).decode()
+
+async def _connect_listener() -> asyncpg.Connection:
     """
-    Setup a database notification listener for a specific channel.
+    Open the shared listener connection and listen on every known channel.
+    Callers hold _listener_lock.
     """
-    logger.info(f"Setting up database listener for channel: {channel}")
+    global _listener_conn
 
     # Convert SQLAlchemy URL format to standard PostgreSQL URL format that asyncpg can accept
     db_url = str(settings.DATABASE_URL).replace('postgresql+asyncpg://', 'postgresql://')
 
+    conn = await asyncpg.connect(db_url)
     try:
-        conn = await asyncpg.connect(db_url)
-        await conn.add_listener(channel, handle_database_notification)
-        return conn
-    except Exception as e:
-        logger.error(f"Error connecting to database: {e}")
+        for channel in _listening_channels:
+            await conn.add_listener(channel, handle_database_notification)
+    except Exception:
+        await conn.close()
         raise
+    _listener_conn = conn
+    logger.info(f"Database listener connected on {len(_listening_channels)} channels")
+    return conn
+
+async def setup_database_listener(channel: str):
+    """
+    Setup a database notification listener for a specific channel.
+    """
+    async with _listener_lock:
+        if channel in _listening_channels:
+            return
+        logger.info(f"Setting up database listener for channel: {channel}")
+        # The channel is recorded first so that, if this fails, the watchdog
+        # picks it up on its next reconnect
+        _listening_channels.add(channel)
+        try:
+            if _listener_conn is None or _listener_conn.is_closed():
+                await _connect_listener()
+            else:
+                await _listener_conn.add_listener(channel, handle_database_notification)
+        except Exception as e:
+            logger.error(f"Error connecting to database: {e}")
+            raise
+
+async def _watch_listener_connection():
+    """
+    Ping the shared listener connection every LISTENER_HEARTBEAT_SECONDS and
+    reconnect it, with all its channels, when it is closed or unresponsive.
+    """
+    global _listener_conn
+    while True:
+        await asyncio.sleep(LISTENER_HEARTBEAT_SECONDS)
+        async with _listener_lock:
+            try:
+                if _listener_conn is None or _listener_conn.is_closed():
+                    await _connect_listener()
+                else:
+                    await _listener_conn.execute("SELECT 1", timeout=LISTENER_HEARTBEAT_SECONDS)
+            except Exception as e:
+                logger.error(f"Database listener connection lost, reconnecting: {e}")
+                if _listener_conn is not None:
+                    _listener_conn.terminate()
+                    _listener_conn = None
+
+def _database_change_message(sub_id: str, payload: str) -> str:
+    # payload is already the JSON text of the notification data, so it is
+    # spliced into the envelope as is rather than decoded and re-encoded for
+    # every subscriber
+    return f'{{"type":"database_change","subscription_id":{_dumps(sub_id)},"data":{payload}}}'
+
+def _database_change_batch_message(sub_id: str, payloads: Tuple[str, ...]) -> str:
+    return f'{{"type":"database_change_batch","subscription_id":{_dumps(sub_id)},"events":[{",".join(payloads)}]}}'
+
+# NOTIFY events are not fanned out one by one. handle_database_notification
+# only queues them; a single dispatcher task drains the queue in windows of
+# NOTIFY_BATCH_WINDOW_SECONDS (or NOTIFY_BATCH_MAX_EVENTS events) and sends
+# each subscription one message per window. A subscription with a single
+# event in the window still gets a plain "database_change" message; several
+# events are sent together as one "database_change_batch" message with an
+# "events" list, in the order they arrived.
+NOTIFY_BATCH_WINDOW_SECONDS = 0.01
+NOTIFY_BATCH_MAX_EVENTS = 100
+_notification_queue: "asyncio.Queue[Tuple[str, str]]" = asyncio.Queue()
+_notification_dispatcher: Optional[asyncio.Task] = None
 
 async def handle_database_notification(conn, pid, channel, payload):
     """
-    Handle database notifications and forward them to WebSocket clients.
+    Handle database notifications by queueing them for the dispatcher.
     """
-    logger.info(f"Received notification on channel {channel}: {payload}")
+    _notification_queue.put_nowait((channel, payload))
 
-    try:
-        data = json.loads(payload)
-        table_name = data.get("table")
-
-        # Special handling for specific channels that need broader notification
-        special_channels = {
-            "buckets_changes": "buckets",
-            "functions_changes": "functions",
-            "tables_changes": None  # Tables is a special case handled separately
-        }
-
-        for user_id, subscriptions in manager.subscriptions.items():
-            for sub_id, sub_data in subscriptions.items():
-                # Different matching strategies
-                should_notify = False
-                
-                # 1. Direct table match: subscription table matches notification table
-                if sub_data.get("table") == table_name:
-                    should_notify = True
-                
-                # 2. Channel match: subscription ID matches notification channel
-                elif sub_id == channel:
-                    should_notify = True
-                
-                # 3. Special case for tables_changes: notify on any table operation
-                elif sub_id == "tables_changes":
-                    should_notify = True
-                
-                # 4. Special case for buckets and functions: match by channel name
-                elif sub_id in special_channels and channel == sub_id:
-                    should_notify = True
-
-                # If any match condition is met, send the notification
-                if should_notify:
-                    await manager.broadcast_to_user(
-                        user_id,
-                        json.dumps({
-                            "type": "database_change",
-                            "subscription_id": sub_id,
-                            "data": data
-                        })
-                    )
-    except Exception as e:
-        logger.error(f"Error handling database notification: {e}")
+async def _dispatch_notifications():
+    """
+    Drain the notification queue in batching windows and forward each batch
+    to WebSocket clients.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _notification_queue.get()]
+        deadline = loop.time() + NOTIFY_BATCH_WINDOW_SECONDS
+        while len(batch) < NOTIFY_BATCH_MAX_EVENTS:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_notification_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await _fan_out_notifications(batch)
+        except Exception as e:
+            logger.error(f"Error handling database notification: {e}")
+
+async def _fan_out_notifications(batch: List[Tuple[str, str]]):
+    # (user_id, subscription_id) -> payloads, in arrival order
+    pending: Dict[Tuple[str, str], List[str]] = {}
+    for channel, payload in batch:
+        logger.info(f"Received notification on channel {channel}: {payload}")
+        try:
+            data = orjson.loads(payload)
+            table_name = data.get("table")
+        except Exception as e:
+            logger.error(f"Error handling database notification: {e}")
+            continue
+
+        # Only the subscriptions indexed under this table or channel are
+        # visited, instead of every subscription of every user
+        for match in manager.matching_subscriptions(channel, table_name):
+            pending.setdefault(match, []).append(payload)
+
+    # Users subscribed under the same ID usually receive the same events, so
+    # each distinct message is built once. The users are then written to
+    # concurrently so one slow client does not hold up the rest
+    messages: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+    sends = []
+    for (user_id, sub_id), payloads in pending.items():
+        key = (sub_id, tuple(payloads))
+        message = messages.get(key)
+        if message is None:
+            if len(payloads) == 1:
+                message = _database_change_message(sub_id, payloads[0])
+            else:
+                message = _database_change_batch_message(sub_id, key[1])
+            messages[key] = message
+        sends.append(manager.broadcast_to_user(user_id, message))
+    await asyncio.gather(*sends)
 
 # Store active connections
 class ConnectionManager:
@@ -98,6 +183,13 @@ class ConnectionManager:
         self.connection_user: Dict[WebSocket, str] = {}
         # Maps user_id -> Dict[subscription_id -> subscription_data]
         self.subscriptions: Dict[str, Dict[str, Any]] = {}
+        # Reverse indexes over self.subscriptions, kept in step by
+        # add_subscription/remove_subscription:
+        # table name -> {(user_id, subscription_id)} for table-filter subscriptions
+        self.table_subscribers: Dict[str, Set[Tuple[str, str]]] = {}
+        # subscription_id -> {user_id}; a subscription ID is matched against the
+        # notification channel, and "tables_changes" matches every channel
+        self.channel_subscribers: Dict[str, Set[str]] = {}
 
     async def connect(self, websocket: WebSocket, user_id: str):
         # WebSocket is already accepted in the endpoint function
@@ -121,28 +213,85 @@ class ConnectionManager:
         await websocket.send_text(message)
 
     async def broadcast(self, message: str):
-        for connections in self.active_connections.values():
-            for connection in connections:
-                await connection.send_text(message)
+        await self._send_all(
+            [connection for connections in self.active_connections.values() for connection in connections],
+            message,
+        )
 
     async def broadcast_to_user(self, user_id: str, message: str):
         if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                await connection.send_text(message)
+            await self._send_all(list(self.active_connections[user_id]), message)
+
+    async def _send_all(self, connections: List[WebSocket], message: str):
+        """
+        Write message to all connections concurrently. A failed send does not
+        stop the others; its socket is logged and dropped.
+        """
+        results = await asyncio.gather(
+            *(connection.send_text(message) for connection in connections),
+            return_exceptions=True,
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Dropping WebSocket after failed send: {result}")
+                self.disconnect(connection)
 
     def add_subscription(self, user_id: str, subscription_id: str, subscription_data: Any):
         if user_id not in self.subscriptions:
             self.subscriptions[user_id] = {}
+        previous = self.subscriptions[user_id].get(subscription_id)
+        if previous is not None:
+            self._unindex_subscription(user_id, subscription_id, previous)
         self.subscriptions[user_id][subscription_id] = subscription_data
+        self._index_subscription(user_id, subscription_id, subscription_data)
         logger.info(f"User {user_id} subscribed to {subscription_id}")
 
     def remove_subscription(self, user_id: str, subscription_id: str):
         if user_id in self.subscriptions and subscription_id in self.subscriptions[user_id]:
-            del self.subscriptions[user_id][subscription_id]
+            subscription_data = self.subscriptions[user_id].pop(subscription_id)
+            self._unindex_subscription(user_id, subscription_id, subscription_data)
             logger.info(f"User {user_id} unsubscribed from {subscription_id}")
             if not self.subscriptions[user_id]:
                 del self.subscriptions[user_id]
 
+    def matching_subscriptions(self, channel: str, table_name: Optional[str]) -> Set[Tuple[str, str]]:
+        """
+        Return the (user_id, subscription_id) pairs a notification on channel
+        for table_name should reach: subscriptions filtered on the table,
+        subscriptions named after the channel and "tables_changes" ones.
+        """
+        matched = set(self.table_subscribers.get(table_name, ()))
+        for sub_id in (channel, "tables_changes"):
+            for user_id in self.channel_subscribers.get(sub_id, ()):
+                matched.add((user_id, sub_id))
+        return matched
+
+    def _index_subscription(self, user_id: str, subscription_id: str, subscription_data: Any):
+        table_name = _subscription_table(subscription_data)
+        if table_name is not None:
+            self.table_subscribers.setdefault(table_name, set()).add((user_id, subscription_id))
+        self.channel_subscribers.setdefault(subscription_id, set()).add(user_id)
+
+    def _unindex_subscription(self, user_id: str, subscription_id: str, subscription_data: Any):
+        table_name = _subscription_table(subscription_data)
+        if table_name is not None:
+            _discard_from_index(self.table_subscribers, table_name, (user_id, subscription_id))
+        _discard_from_index(self.channel_subscribers, subscription_id, user_id)
+
+def _subscription_table(subscription_data: Any) -> Optional[str]:
+    if isinstance(subscription_data, dict):
+        table_name = subscription_data.get("table")
+        if isinstance(table_name, str):
+            return table_name
+    return None
+
+def _discard_from_index(index: Dict[Any, Set[Any]], key: Any, member: Any):
+    members = index.get(key)
+    if members is not None:
+        members.discard(member)
+        if not members:
+            del index[key]
+
 manager = ConnectionManager()
 
 @router.on_event("startup")
@@ -150,6 +299,9 @@ async def startup_event():
     """
     Initialize database listeners on startup.
     """
+    global _listener_watchdog, _notification_dispatcher
+    _notification_dispatcher = asyncio.create_task(_dispatch_notifications())
+    _listener_watchdog = asyncio.create_task(_watch_listener_connection())
     try:
         async with AsyncSession(engine) as session:
             query = """
@@ -162,9 +314,7 @@ async def startup_event():
             tables = [row.table_name for row in result.fetchall()]
 
             for table_name in tables:
-                channel = f"{table_name}_changes"
-                if channel not in db_listeners:
-                    db_listeners[channel] = await setup_database_listener(channel)
+                await setup_database_listener(f"{table_name}_changes")
 
     except Exception as e:
         logger.error(f"Error setting up database listeners: {e}")
@@ -174,29 +324,24 @@ async def shutdown_event():
     """
     Clean up database listeners on shutdown.
     """
-    for channel, conn in db_listeners.items():
+    global _listener_conn
+    for task in (_listener_watchdog, _notification_dispatcher):
+        if task is not None:
+            task.cancel()
+    if _listener_conn is not None:
         try:
-            await conn.close()
-            logger.info(f"Closed database listener for channel {channel}")
+            await _listener_conn.close()
+            logger.info(f"Closed database listener for {len(_listening_channels)} channels")
         except Exception as e:
-            logger.error(f"Error closing database listener connection for channel {channel}: {e}")
+            logger.error(f"Error closing database listener connection: {e}")
+        _listener_conn = None
 
 async def get_user_from_token(token: str, db: AsyncSession) -> str:
     """
-    Validate token and return user_id.
+    Validate token and return user_id. Verification is shared with the HTTP
+    endpoints (deps._get_user_from_token), including its token cache.
     """
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        token_data = TokenPayload(sub=email)
-    except JWTError:
-        return None
-
-    user = await get_user_by_email(db, email=token_data.sub)
+    user = await _get_user_from_token(db, token)
     if not user or not user.is_active:
         return None
 
@@ -212,17 +357,17 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
     try:
         # Wait for authentication message
         auth_message = await websocket.receive_text()
-        auth_data = json.loads(auth_message)
+        auth_data = orjson.loads(auth_message)
 
         if auth_data.get("type") != "authenticate" or "token" not in auth_data:
-            await websocket.send_text(json.dumps({"error": "Authentication required"}))
+            await websocket.send_text(_dumps({"error": "Authentication required"}))
             await websocket.close()
             return
 
         # Validate token
         user_id = await get_user_from_token(auth_data["token"], db)
         if not user_id:
-            await websocket.send_text(json.dumps({"error": "Invalid authentication"}))
+            await websocket.send_text(_dumps({"error": "Invalid authentication"}))
             await websocket.close()
             return
 
@@ -231,14 +376,14 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
 
         # Send confirmation
         await manager.send_personal_message(
-            json.dumps({"type": "connected", "user_id": user_id}),
+            _dumps({"type": "connected", "user_id": user_id}),
             websocket
         )
 
         # Handle messages
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            message = orjson.loads(data)
 
             # Handle subscription
             if message.get("type") == "subscribe":
@@ -253,9 +398,9 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
                     # If the client subscribes directly to "<table>_changes"
                     # and we are not yet listening on that channel, start it.
                     if (subscription_id.endswith("_changes")
-                            and subscription_id not in db_listeners):
+                            and subscription_id not in _listening_channels):
                         try:
-                            db_listeners[subscription_id] = await setup_database_listener(subscription_id)
+                            await setup_database_listener(subscription_id)
                             logger.info(f"Set up new database listener for channel {subscription_id}")
                         except Exception as e:
                             logger.error(f"Error setting up listener for channel {subscription_id}: {e}")
@@ -265,15 +410,15 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
                     if "table" in subscription_data:
                         table_name = subscription_data["table"]
                         channel = f"{table_name}_changes"
-                        if channel not in db_listeners:
+                        if channel not in _listening_channels:
                             try:
-                                db_listeners[channel] = await setup_database_listener(channel)
+                                await setup_database_listener(channel)
                                 logger.info(f"Set up new database listener for table {table_name}")
                             except Exception as e:
                                 logger.error(f"Error setting up listener for table {table_name}: {e}")
 
                     await manager.send_personal_message(
-                        json.dumps({
+                        _dumps({
                             "type": "subscribed",
                             "subscription_id": subscription_id
                         }),
@@ -287,7 +432,7 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession = Depends(ge
                 if subscription_id:
                     manager.remove_subscription(user_id, subscription_id)
                     await manager.send_personal_message(
-                        json.dumps({
+                        _dumps({
                             "type": "unsubscribed",
                             "subscription_id": subscription_id
                         }),
@@ -310,14 +455,14 @@ async def test_websocket(websocket: WebSocket):
 
     try:
         # Send a welcome message
-        await websocket.send_text(json.dumps({"message": "Connected to test WebSocket"}))
+        await websocket.send_text(_dumps({"message": "Connected to test WebSocket"}))
 
         # Send periodic messages
         counter = 0
         while True:
             await asyncio.sleep(5)
             counter += 1
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(_dumps({
                 "type": "test",
                 "message": f"Test message {counter}",
                 "timestamp": str(asyncio.get_event_loop().time())
@@ -2,11 +2,10 @@ from typing import Any, List
 
 from fastapi import APIRouter, Body, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.encoders import jsonable_encoder
 
 from ...schemas.user import User, UserCreate, UserUpdate, PasswordChange, AnonKeyResponse
 from ...crud.user import get_user, get_users, create_user, update_user, delete_user, get_user_by_email, change_user_password, count_regular_users
-from ..deps import get_db, get_current_active_user, get_current_active_superuser
+from ..deps import get_db, get_current_active_user, get_current_active_superuser, invalidate_cached_user
 from app.core.config import settings
 from ...db.notify import emit_table_notification
 
@@ -32,12 +31,13 @@ async def update_user_me(
     Update own user.
     """
     user = await update_user(db, user_id=current_user.id, user_in=user_in)
+    invalidate_cached_user(current_user.id)
     
     await emit_table_notification(
         db, 
         "users", 
         "UPDATE", 
-        jsonable_encoder(user)
+        user
     )
     
     return user
@@ -64,6 +64,7 @@ async def change_password(
             status_code=400,
             detail="Current password is incorrect"
         )
+    invalidate_cached_user(current_user.id)
     
     return True
 
@@ -88,10 +89,11 @@ async def delete_user_me(
         "users", 
         "DELETE", 
         None, 
-        jsonable_encoder(current_user)
+        current_user
     )
     
     result = await delete_user(db, user_id=current_user.id)
+    invalidate_cached_user(current_user.id)
     return result
 
 @router.get("/", response_model=List[User])
@@ -181,7 +183,7 @@ async def create_user_admin(
         db, 
         "users", 
         "INSERT", 
-        jsonable_encoder(user)
+        user
     )
     
     return user
@@ -204,12 +206,13 @@ async def update_user_admin(
             detail="The user with this id does not exist in the system",
         )
     user = await update_user(db, user_id=user_id, user_in=user_in)
+    invalidate_cached_user(user_id)
     
     await emit_table_notification(
         db, 
         "users", 
         "UPDATE", 
-        jsonable_encoder(user)
+        user
     )
     
     return user
@@ -236,10 +239,11 @@ async def delete_user_admin(
         "users", 
         "DELETE", 
         None, 
-        jsonable_encoder(user)
+        user
     )
     
     result = await delete_user(db, user_id=user_id)
+    invalidate_cached_user(user_id)
     return result
 
 @router.get("/me/anon-key", response_model=AnonKeyResponse)
@@ -0,0 +1,78 @@
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, AsyncIterator, Optional, Tuple
+from datetime import datetime
+import uuid
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+from ..crud.bucket import encode_bucket_cursor, decode_bucket_cursor
+
+# Listings that may be large are written out a few rows at a time instead of
+# materialising the whole list of dicts and then the whole JSON body.
+STREAM_CHUNK_ROWS = 32
+
+def stream_json_list(adapter: TypeAdapter, rows: Iterable[Any], from_row: Optional[Callable[[Any], Any]] = None) -> Iterator[bytes]:
+    """
+    Encode already fetched rows as one JSON array, STREAM_CHUNK_ROWS at a time.
+    Rows are validated with adapter (from attributes) unless from_row builds
+    the item.
+    """
+    chunk = [b"["]
+    for i, row in enumerate(rows):
+        if i:
+            chunk.append(b",")
+        item = from_row(row) if from_row else adapter.validate_python(row, from_attributes=True)
+        chunk.append(adapter.dump_json(item))
+        if len(chunk) >= 2 * STREAM_CHUNK_ROWS:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+async def stream_json_rows(adapter: TypeAdapter, rows: AsyncIterable[Any]) -> AsyncIterator[bytes]:
+    """
+    Same as stream_json_list for rows still being read from a database
+    cursor, so they are encoded as they arrive. get_db closes the request's
+    session before a streamed body is sent, so the rows must come from a
+    session the stream opens itself.
+    """
+    chunk = [b"["]
+    first = True
+    async for row in rows:
+        if not first:
+            chunk.append(b",")
+        first = False
+        chunk.append(adapter.dump_json(adapter.validate_python(row, from_attributes=True)))
+        if len(chunk) >= 2 * STREAM_CHUNK_ROWS:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]")
+    yield b"".join(chunk)
+
+def json_list_response(
+    adapter: TypeAdapter,
+    rows: Iterable[Any],
+    headers: Optional[Dict[str, str]] = None,
+    from_row: Optional[Callable[[Any], Any]] = None,
+) -> StreamingResponse:
+    return StreamingResponse(stream_json_list(adapter, rows, from_row), media_type="application/json", headers=headers)
+
+# Listings return a list body, so the keyset cursor for the next page travels
+# in this header (present only when the page was full)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, uuid.UUID]]:
+    """Decode a cursor query parameter, rejecting malformed ones with a 400."""
+    if cursor is None:
+        return None
+    try:
+        return decode_bucket_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def next_cursor_headers(rows: list, limit: int) -> Dict[str, str]:
+    """NEXT_CURSOR_HEADER for a page of row mappings, if the page was full."""
+    if not rows or len(rows) < limit or rows[-1]["created_at"] is None:
+        return {}
+    return {NEXT_CURSOR_HEADER: encode_bucket_cursor(rows[-1]["created_at"], rows[-1]["id"])}
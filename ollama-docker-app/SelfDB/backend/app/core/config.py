@@ -38,6 +38,14 @@ class Settings(BaseSettings):
              raise ValueError("Missing PostgreSQL connection details in environment variables.")
         return f"postgresql+asyncpg://{user}:{password}@{server}:{port}/{db}"
 
+    # SQLAlchemy connection pool. Every request holds a session for its whole
+    # lifetime, so size + overflow should cover peak concurrent requests while
+    # staying under Postgres' max_connections (100 by default).
+    DB_POOL_SIZE: int = 25
+    DB_MAX_OVERFLOW: int = 25
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+
     # JWT Settings
     SECRET_KEY: str # Needs to be set in .env
     ALGORITHM: str = "HS256"
@@ -51,6 +59,15 @@ class Settings(BaseSettings):
     # External URL for generating public-facing URLs to files (via Nginx proxy)
     # Default to local storage service; overridden by STORAGE_SERVICE_EXTERNAL_URL in .env
     STORAGE_SERVICE_EXTERNAL_URL: AnyHttpUrl = "http://localhost:8001"
+    # Connection pool of the shared HTTP client used to call the storage service.
+    # Requests beyond STORAGE_HTTP_MAX_CONNECTIONS queue for a free connection.
+    STORAGE_HTTP_MAX_CONNECTIONS: int = 512
+    STORAGE_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 256
+    STORAGE_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    # Negotiate HTTP/2 with the storage service. Only takes effect over https
+    # (ALPN) and when the server supports it; the bundled uvicorn storage
+    # service speaks HTTP/1.1 only, so this is off by default.
+    STORAGE_HTTP2: bool = False
 
     # Optional Email Settings (for password reset, etc.)
     MAIL_USERNAME: Optional[str] = None
@@ -0,0 +1,32 @@
+import httpx
+from typing import Optional
+
+from .config import settings
+
+# Shared HTTP client so connections to the storage service are pooled and kept
+# alive across requests instead of being re-established per request. Used by
+# both the API dependencies and the services layer; opened on application
+# startup and closed on shutdown (see main.py).
+_shared_async_client: Optional[httpx.AsyncClient] = None
+
+def get_shared_client() -> httpx.AsyncClient:
+    """Return the shared storage service HTTP client, creating it on first use."""
+    global _shared_async_client
+    if _shared_async_client is None or _shared_async_client.is_closed:
+        _shared_async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(5.0, read=60.0, write=60.0, pool=5.0),  # Longer read/write timeouts for file uploads/downloads
+            http2=settings.STORAGE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.STORAGE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.STORAGE_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.STORAGE_HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _shared_async_client
+
+async def close_shared_client() -> None:
+    """Close the shared storage service HTTP client (call on application shutdown)."""
+    global _shared_async_client
+    if _shared_async_client is not None:
+        await _shared_async_client.aclose()
+        _shared_async_client = None
@@ -2,6 +2,7 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 from app.core.config import settings
+from app.core.security import is_valid_anon_key
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,7 +34,7 @@ class AnonKeyEnforcerMiddleware(BaseHTTPMiddleware):
 
         # If anon-key is required, enforce it
         if settings.ANON_KEY:
-            if not anon_key or anon_key != settings.ANON_KEY:
+            if not is_valid_anon_key(anon_key):
                 logger.warning(f"Missing or invalid anon-key: {anon_key}")
                 return JSONResponse(
                     status_code=401,
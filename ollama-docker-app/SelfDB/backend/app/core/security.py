@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Any, Union, Optional
+import base64
+import calendar
+import hashlib
+import hmac
 import secrets
 
-from jose import jwt
+import orjson
 from passlib.context import CryptContext
 
 from .config import settings
@@ -10,6 +14,59 @@ from .config import settings
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Anonymous API key, encoded once for constant-time comparison
+_ANON_KEY_BYTES = settings.ANON_KEY.encode() if settings.ANON_KEY else b""
+
+def is_valid_anon_key(api_key: Optional[str]) -> bool:
+    """
+    Check an API key against the configured anonymous key.
+    
+    The comparison runs in constant time so response timing does not leak
+    how much of a guessed key was correct.
+    
+    Args:
+        api_key: The key supplied by the client, if any.
+        
+    Returns:
+        True if the key matches ANON_KEY, False otherwise (including when no ANON_KEY is configured).
+    """
+    if not api_key or not _ANON_KEY_BYTES:
+        return False
+    return hmac.compare_digest(api_key.encode(), _ANON_KEY_BYTES)
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+# For HS256 the key never changes, so the HMAC state keyed with SECRET_KEY is
+# built once and copied per token, and the JWT header segment is constant.
+# Any other algorithm goes through PyJWT.
+_HS256_TEMPLATE = (
+    hmac.new(settings.SECRET_KEY.encode(), digestmod=hashlib.sha256)
+    if settings.ALGORITHM == "HS256" else None
+)
+_HS256_HEADER_SEGMENT = _b64url(orjson.dumps({"alg": "HS256", "typ": "JWT"}))
+
+def encode_token(claims: dict) -> str:
+    """
+    Sign a set of JWT claims with SECRET_KEY.
+    
+    Produces the same compact JWS as jwt.encode(claims, settings.SECRET_KEY,
+    algorithm=settings.ALGORITHM), without re-deriving the HMAC key per call.
+    
+    Args:
+        claims: JSON-serialisable claims; "exp" must already be a Unix timestamp.
+        
+    Returns:
+        The encoded JWT token as a string.
+    """
+    if _HS256_TEMPLATE is None:
+        import jwt
+        return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    signing_input = _HS256_HEADER_SEGMENT + b"." + _b64url(orjson.dumps(claims))
+    mac = _HS256_TEMPLATE.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode()
+
 def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token.
@@ -26,8 +83,8 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    to_encode = {"exp": calendar.timegm(expire.utctimetuple()), "sub": str(subject)}
+    encoded_jwt = encode_token(to_encode)
     return encoded_jwt
 
 def create_refresh_token(user_id: Union[str, Any]) -> tuple[str, datetime]:
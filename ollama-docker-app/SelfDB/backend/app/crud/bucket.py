@@ -1,7 +1,12 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy import func, tuple_
+from datetime import datetime
+import base64
+import time
 import uuid
 import re
 
@@ -32,6 +37,64 @@ async def get_bucket(db: AsyncSession, bucket_id: uuid.UUID) -> Optional[Bucket]
     result = await db.execute(select(Bucket).filter(Bucket.id == bucket_id))
     return result.scalars().first()
 
+@dataclass(frozen=True)
+class BucketRef:
+    """
+    The fields of a bucket that file endpoints check on every request.
+    """
+    id: uuid.UUID
+    name: str
+    owner_id: uuid.UUID
+    is_public: bool
+
+# In-process cache of BucketRefs keyed by bucket id, so file endpoints do not
+# re-read the same bucket row on every request. Entries live for at most
+# BUCKET_REF_CACHE_TTL_SECONDS and are dropped by update_bucket/delete_bucket.
+BUCKET_REF_CACHE_TTL_SECONDS = 30
+BUCKET_REF_CACHE_MAX_SIZE = 1024
+_bucket_ref_cache: "OrderedDict[uuid.UUID, Tuple[float, BucketRef]]" = OrderedDict()
+
+def invalidate_bucket_ref(bucket_id: uuid.UUID) -> None:
+    """
+    Drop the cached BucketRef for a bucket. Call after changing or deleting it.
+    """
+    _bucket_ref_cache.pop(bucket_id, None)
+
+async def get_bucket_ref(db: AsyncSession, bucket_id: uuid.UUID) -> Optional[BucketRef]:
+    """
+    Get the id, name, owner and visibility of a bucket, served from the
+    bucket ref cache when possible. Missing buckets are not cached.
+    """
+    entry = _bucket_ref_cache.get(bucket_id)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            _bucket_ref_cache.move_to_end(bucket_id)
+            return entry[1]
+        _bucket_ref_cache.pop(bucket_id, None)
+
+    result = await db.execute(
+        select(Bucket.name, Bucket.owner_id, Bucket.is_public).filter(Bucket.id == bucket_id)
+    )
+    row = result.first()
+    if row is None:
+        return None
+
+    ref = BucketRef(id=bucket_id, name=row.name, owner_id=row.owner_id, is_public=bool(row.is_public))
+    _bucket_ref_cache[bucket_id] = (time.monotonic() + BUCKET_REF_CACHE_TTL_SECONDS, ref)
+    while len(_bucket_ref_cache) > BUCKET_REF_CACHE_MAX_SIZE:
+        _bucket_ref_cache.popitem(last=False)
+    return ref
+
+async def get_bucket_owner(db: AsyncSession, bucket_id: uuid.UUID) -> Optional[Tuple[uuid.UUID, bool]]:
+    """
+    Get (owner_id, is_public) for a bucket, for permission checks that do not
+    need the full row.
+    """
+    result = await db.execute(
+        select(Bucket.owner_id, Bucket.is_public).filter(Bucket.id == bucket_id)
+    )
+    return result.first()
+
 async def get_bucket_by_minio_name(db: AsyncSession, minio_bucket_name: str) -> Optional[Bucket]:
     """
     Get a bucket by MinIO bucket name.
@@ -53,56 +116,78 @@ async def get_buckets_by_owner(
     )
     return result.scalars().all()
 
-async def get_public_buckets(
-    db: AsyncSession, exclude_owner_id: Optional[uuid.UUID] = None, skip: int = 0, limit: int = 100
-) -> List[Bucket]:
+def _buckets_with_stats_query():
     """
-    Get public buckets with pagination, optionally excluding buckets owned by a specific user.
+    Select every bucket column plus file_count and total_size, LEFT JOINed to
+    per-bucket file aggregates so buckets without files report zeros.
     """
-    query = select(Bucket).filter(Bucket.is_public == True)
-
-    # Exclude buckets owned by the specified user if provided
-    if exclude_owner_id:
-        query = query.filter(Bucket.owner_id != exclude_owner_id)
-
-    result = await db.execute(
-        query
-        .offset(skip)
-        .limit(limit)
+    stats = (
+        select(
+            File.bucket_id,
+            func.count(File.id).label("file_count"),
+            func.sum(File.size).label("total_size")
+        )
+        .group_by(File.bucket_id)
+        .subquery()
+    )
+    return (
+        select(
+            *Bucket.__table__.columns,
+            func.coalesce(stats.c.file_count, 0).label("file_count"),
+            func.coalesce(stats.c.total_size, 0).label("total_size")
+        )
+        .outerjoin(stats, stats.c.bucket_id == Bucket.id)
     )
-    return result.scalars().all()
 
-async def get_all_buckets(
-    db: AsyncSession, skip: int = 0, limit: int = 100
-) -> List[Bucket]:
+def encode_bucket_cursor(created_at: datetime, bucket_id: uuid.UUID) -> str:
     """
-    Get all buckets with pagination.
-    This is used for authenticated users who should see all buckets.
+    Encode the position after a bucket row as an opaque pagination cursor.
     """
-    result = await db.execute(
-        select(Bucket)
-        .offset(skip)
-        .limit(limit)
-    )
-    return result.scalars().all()
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{bucket_id}".encode()).decode()
+
+def decode_bucket_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """
+    Decode a cursor from encode_bucket_cursor. Raises ValueError if malformed.
+    """
+    try:
+        created_at, bucket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(bucket_id)
+    except (TypeError, UnicodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
 
-async def get_bucket_stats(db: AsyncSession, bucket_id: uuid.UUID) -> dict:
+async def get_all_buckets_with_stats(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    public_only: bool = False,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+) -> List[dict]:
     """
-    Get statistics for a bucket (file count and total size).
+    Get buckets newest first, each joined with its file count and total size.
+    Rows come back as plain mappings keyed like BucketWithStats.
+    When `after` (a decoded cursor) is given, the page starts right after that
+    bucket using the (created_at, id) index and `skip` is ignored, so deep
+    pages cost the same as the first one.
     """
-    # Query to get file count and total size
-    query = select(
-        func.count(File.id).label("file_count"),
-        func.coalesce(func.sum(File.size), 0).label("total_size")
-    ).filter(File.bucket_id == bucket_id)
+    query = _buckets_with_stats_query().order_by(Bucket.created_at.desc(), Bucket.id.desc())
+
+    if public_only:
+        query = query.filter(Bucket.is_public == True)
+
+    if after is not None:
+        query = query.filter(tuple_(Bucket.created_at, Bucket.id) < tuple_(*after))
+    else:
+        query = query.offset(skip)
 
-    result = await db.execute(query)
-    stats = result.first()
+    result = await db.execute(query.limit(limit))
+    return result.mappings().all()
 
-    return {
-        "file_count": stats.file_count if stats else 0,
-        "total_size": stats.total_size if stats else 0
-    }
+async def get_bucket_with_stats(db: AsyncSession, bucket_id: uuid.UUID) -> Optional[dict]:
+    """
+    Get a bucket by ID together with its file count and total size.
+    """
+    result = await db.execute(_buckets_with_stats_query().filter(Bucket.id == bucket_id))
+    return result.mappings().first()
 
 async def create_bucket(
     db: AsyncSession, bucket_in: BucketCreate, owner_id: uuid.UUID
@@ -161,6 +246,7 @@ async def update_bucket(
         setattr(bucket, field, value)
 
     await db.commit()
+    invalidate_bucket_ref(bucket_id)
     await db.refresh(bucket)
     return bucket
 
@@ -174,4 +260,5 @@ async def delete_bucket(db: AsyncSession, bucket_id: uuid.UUID) -> bool:
 
     await db.delete(bucket)
     await db.commit()
+    invalidate_bucket_ref(bucket_id)
     return True
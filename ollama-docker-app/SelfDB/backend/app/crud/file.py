@@ -1,10 +1,12 @@
-from typing import Optional, List
+from typing import Any, AsyncIterator, Mapping, Optional, List, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete
+from sqlalchemy import update, delete, or_, tuple_
+from datetime import datetime
 import uuid
 
 from ..models.file import File
+from ..models.bucket import Bucket
 from ..schemas.file import FileCreate, FileUpdate
 
 async def get_file(db: AsyncSession, file_id: uuid.UUID) -> Optional[File]:
@@ -14,37 +16,149 @@ async def get_file(db: AsyncSession, file_id: uuid.UUID) -> Optional[File]:
     result = await db.execute(select(File).filter(File.id == file_id))
     return result.scalars().first()
 
+async def get_accessible_file(
+    db: AsyncSession,
+    file_id: uuid.UUID,
+    user_id: Optional[uuid.UUID] = None,
+    is_superuser: bool = False,
+) -> Optional[File]:
+    """
+    Get a file by ID if the caller may access it, in one query.
+    Files in public buckets are open to everyone (user_id None for anonymous
+    callers); otherwise only the file's owner and superusers may see it.
+    Returns None for missing files, files outside a bucket and files the
+    caller may not access alike.
+    """
+    query = select(File).join(Bucket, File.bucket_id == Bucket.id).filter(File.id == file_id)
+    if not is_superuser:
+        if user_id is None:
+            query = query.filter(Bucket.is_public == True)
+        else:
+            query = query.filter(or_(Bucket.is_public == True, File.owner_id == user_id))
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def get_public_file(db: AsyncSession, file_id: uuid.UUID) -> Optional[File]:
+    """
+    Get a file by ID only if it is in a public bucket, in one query.
+    Returns None for missing files, files outside a bucket and files in
+    private buckets alike.
+    """
+    result = await db.execute(
+        select(File)
+        .join(Bucket, File.bucket_id == Bucket.id)
+        .filter(File.id == file_id, Bucket.is_public == True)
+    )
+    return result.scalars().first()
+
+def _newest_files_page(query, skip: int, limit: int, after: Optional[Tuple[datetime, uuid.UUID]]):
+    """
+    Order a files query newest first and apply either the keyset cursor
+    (`after`, as decoded by decode_bucket_cursor) or, without one, `skip`.
+    """
+    query = query.order_by(File.created_at.desc(), File.id.desc())
+    if after is not None:
+        query = query.filter(tuple_(File.created_at, File.id) < tuple_(*after))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
 async def get_files_by_owner(
-    db: AsyncSession, owner_id: uuid.UUID, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    owner_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
 ) -> List[File]:
     """
-    Get files by owner ID with pagination.
+    Get files by owner ID newest first, with pagination.
+    When `after` is given the page starts right after that file using the
+    (owner_id, created_at, id) index and `skip` is ignored.
     """
     result = await db.execute(
-        select(File)
-        .filter(File.owner_id == owner_id)
-        .offset(skip)
-        .limit(limit)
+        _newest_files_page(select(File).filter(File.owner_id == owner_id), skip, limit, after)
     )
     return result.scalars().all()
 
 async def get_files_by_bucket(
-    db: AsyncSession, bucket_id: uuid.UUID, skip: int = 0, limit: int = 100
+    db: AsyncSession,
+    bucket_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
 ) -> List[File]:
     """
-    Get files by bucket ID with pagination.
+    Get files by bucket ID newest first, with pagination.
+    When `after` is given the page starts right after that file using the
+    (bucket_id, created_at, id) index and `skip` is ignored.
     """
     result = await db.execute(
-        select(File)
-        .filter(File.bucket_id == bucket_id)
-        .offset(skip)
-        .limit(limit)
+        _newest_files_page(select(File).filter(File.bucket_id == bucket_id), skip, limit, after)
     )
     return result.scalars().all()
 
-async def create_file(db: AsyncSession, file_in: FileCreate) -> File:
+# Columns returned by the file listing endpoints (the File response schema)
+_FILE_LIST_COLUMNS = (
+    File.id,
+    File.filename,
+    File.content_type,
+    File.bucket_name,
+    File.object_name,
+    File.size,
+    File.owner_id,
+    File.bucket_id,
+    File.created_at,
+    File.updated_at,
+)
+
+async def get_files_by_bucket_light(
+    db: AsyncSession,
+    bucket_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+) -> List[dict]:
+    """
+    Same page as get_files_by_bucket, as plain column mappings.
+    Skips ORM instance construction and identity-map bookkeeping for
+    read-only listings.
+    """
+    result = await db.execute(
+        _newest_files_page(select(*_FILE_LIST_COLUMNS).filter(File.bucket_id == bucket_id), skip, limit, after)
+    )
+    return result.mappings().all()
+
+async def stream_files(
+    db: AsyncSession,
+    owner_id: Optional[uuid.UUID] = None,
+    bucket_id: Optional[uuid.UUID] = None,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[Tuple[datetime, uuid.UUID]] = None,
+    yield_per: int = 100,
+) -> AsyncIterator[Mapping[str, Any]]:
+    """
+    Stream the same page as get_files_by_bucket (if bucket_id is given) or
+    get_files_by_owner, as plain column mappings, fetching yield_per rows at
+    a time through a server-side cursor instead of buffering the whole page.
+    The session must stay open until the iterator is exhausted.
+    """
+    query = select(*_FILE_LIST_COLUMNS)
+    if bucket_id is not None:
+        query = query.filter(File.bucket_id == bucket_id)
+    else:
+        query = query.filter(File.owner_id == owner_id)
+    query = _newest_files_page(query, skip, limit, after).execution_options(yield_per=yield_per)
+
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield row
+
+async def create_file(db: AsyncSession, file_in: FileCreate, commit: bool = True) -> File:
     """
     Create a new file record.
+    With commit=False the row is only flushed, and is committed or rolled back
+    with the caller's transaction.
     """
     db_file = File(
         filename=file_in.filename,
@@ -56,7 +170,10 @@ async def create_file(db: AsyncSession, file_in: FileCreate) -> File:
         bucket_id=file_in.bucket_id,
     )
     db.add(db_file)
-    await db.commit()
+    if commit:
+        await db.commit()
+    else:
+        await db.flush()
     await db.refresh(db_file)
     return db_file
 
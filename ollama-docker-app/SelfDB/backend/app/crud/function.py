@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from uuid import UUID
 import json
 import os
@@ -76,21 +76,47 @@ def write_function_file(function_id, function_name, code):
 # Functions CRUD
 # ------------------------------------------------------------------
 
+# Functions are looked up by primary key with db.get, which checks the
+# session's identity map before querying. get_db gives every request its own
+# session, so a function already loaded during the request (by an endpoint,
+# a dependency or a CRUD helper) is returned from memory instead of being
+# selected again.
+
 async def get_function(db: AsyncSession, *, function_id: UUID) -> Optional[Function]:
-    result = await db.execute(select(Function).filter(Function.id == function_id))
-    return result.scalars().first()
+    return await db.get(Function, function_id)
 
 
-async def get_functions_by_owner(
-    db: AsyncSession, *, owner_id: UUID, skip: int = 0, limit: int = 100
-) -> List[Function]:
-    result = await db.execute(
+async def get_function_for_user(
+    db: AsyncSession, *, function_id: UUID, user_id: UUID, is_superuser: bool = False
+) -> Optional[Function]:
+    """
+    Get a function by ID if the user may manage it, in at most one query:
+    owners and superusers only. Returns None for missing functions and
+    functions owned by someone else alike.
+    """
+    function = await db.get(Function, function_id)
+    if function is None or (not is_superuser and function.owner_id != user_id):
+        return None
+    return function
+
+
+async def stream_functions_by_owner(
+    db: AsyncSession, *, owner_id: UUID, skip: int = 0, limit: int = 100, yield_per: int = 100
+) -> AsyncIterator[Function]:
+    """
+    Yield a page of the owner's functions, fetching yield_per rows at a time
+    through a server-side cursor instead of buffering the whole page.
+    The session must stay open until the iterator is exhausted.
+    """
+    result = await db.stream(
         select(Function)
         .filter(Function.owner_id == owner_id)
         .offset(skip)
         .limit(limit)
+        .execution_options(yield_per=yield_per)
     )
-    return result.scalars().all()
+    async for function in result.scalars():
+        yield function
 
 
 async def create_function(
@@ -209,11 +235,21 @@ async def delete_function(db: AsyncSession, *, function: Function) -> None:
 # Version helpers
 # ------------------------------------------------------------------
 
-async def get_versions(db: AsyncSession, *, function_id: UUID) -> List[FunctionVersion]:
-    result = await db.execute(
-        select(FunctionVersion).filter(FunctionVersion.function_id == function_id).order_by(FunctionVersion.version_number.desc())
+async def stream_versions(
+    db: AsyncSession, *, function_id: UUID, yield_per: int = 100
+) -> AsyncIterator[FunctionVersion]:
+    """
+    Yield a function's versions, newest first, through a server-side cursor
+    like stream_functions_by_owner.
+    """
+    result = await db.stream(
+        select(FunctionVersion)
+        .filter(FunctionVersion.function_id == function_id)
+        .order_by(FunctionVersion.version_number.desc())
+        .execution_options(yield_per=yield_per)
     )
-    return result.scalars().all()
+    async for version in result.scalars():
+        yield version
 
 
 # ------------------------------------------------------------------
@@ -225,6 +261,18 @@ async def list_env_vars(db: AsyncSession, *, function_id: UUID) -> List[Function
     return result.scalars().all()
 
 
+async def get_env_var(
+    db: AsyncSession, *, function_id: UUID, env_id: UUID
+) -> Optional[FunctionEnvVar]:
+    """Return one env var of a function, or None if it belongs elsewhere."""
+    result = await db.execute(
+        select(FunctionEnvVar).filter(
+            FunctionEnvVar.id == env_id, FunctionEnvVar.function_id == function_id
+        )
+    )
+    return result.scalar_one_or_none()
+
+
 async def create_env_var(
     db: AsyncSession, *, function_id: UUID, var_in: FunctionEnvVarBase
 ) -> FunctionEnvVar:
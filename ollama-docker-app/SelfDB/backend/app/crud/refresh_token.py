@@ -2,10 +2,11 @@ from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.refresh_token import RefreshToken
+from ..models.user import User
 from ..core.security import create_refresh_token
 
 async def create_refresh_token_db(db: AsyncSession, user_id: UUID) -> tuple[str, datetime]:
@@ -55,6 +56,37 @@ async def get_refresh_token(db: AsyncSession, token: str) -> Optional[RefreshTok
     )
     return result.scalars().first()
 
+# Built once with bound parameters, like get_user_by_email, so every refresh
+# reuses the same compiled SQL and the connection's prepared statement
+_refresh_token_with_email_stmt = (
+    select(RefreshToken, User.email)
+    .outerjoin(User, User.id == RefreshToken.user_id)
+    .where(RefreshToken.token == bindparam("token"))
+    .where(RefreshToken.revoked == False)
+    .where(RefreshToken.expires_at > bindparam("now"))
+)
+
+async def get_refresh_token_with_email(db: AsyncSession, token: str) -> Optional[tuple[RefreshToken, Optional[str]]]:
+    """
+    Retrieve a valid refresh token together with its user's email in a single query.
+    
+    Args:
+        db: Database session
+        token: The refresh token string
+        
+    Returns:
+        Tuple of (RefreshToken, user email) if the token is found and valid, None otherwise.
+        The email is None if the user no longer exists.
+    """
+    result = await db.execute(
+        _refresh_token_with_email_stmt,
+        {"token": token, "now": datetime.utcnow()}
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return row[0], row[1]
+
 async def revoke_refresh_token(db: AsyncSession, token: str) -> bool:
     """
     Revoke a refresh token so it can no longer be used.
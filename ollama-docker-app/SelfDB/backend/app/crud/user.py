@@ -1,7 +1,9 @@
+import asyncio
 from typing import Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import update, delete, func
+from sqlalchemy import update, delete, func, bindparam
+from sqlalchemy.dialects.postgresql import insert
 
 from ..models.user import User
 from ..schemas.user import UserCreate, UserUpdate
@@ -14,12 +16,16 @@ async def get_user(db: AsyncSession, user_id: str) -> Optional[User]:
     result = await db.execute(select(User).filter(User.id == user_id))
     return result.scalars().first()
 
+# Built once so every lookup renders the same SQL and reuses the prepared
+# statement cached on the connection (this runs on every authenticated request)
+_user_by_email_stmt = select(User).where(User.email == bindparam("email")).limit(1)
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """
     Get a user by email.
     """
     # Execute the query without keeping transaction open
-    result = await db.execute(select(User).filter(User.email == email))
+    result = await db.execute(_user_by_email_stmt, {"email": email})
     user = result.scalars().first()
     
     # If this is a standalone transaction (not part of a larger one), commit it
@@ -59,6 +65,28 @@ async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
     await db.refresh(db_user)
     return db_user
 
+async def create_user_if_not_exists(db: AsyncSession, user_in: UserCreate) -> Optional[User]:
+    """
+    Create a new user unless the email is already taken, in a single
+    INSERT ... ON CONFLICT DO NOTHING RETURNING round trip.
+    Returns None if a user with this email already exists.
+    """
+    stmt = (
+        insert(User)
+        .values(
+            email=user_in.email,
+            hashed_password=get_password_hash(user_in.password),
+            is_active=user_in.is_active,
+            is_superuser=user_in.is_superuser,
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User)
+    )
+    result = await db.execute(stmt)
+    db_user = result.scalars().first()
+    await db.commit()
+    return db_user
+
 async def update_user(db: AsyncSession, user_id: str, user_in: UserUpdate) -> Optional[User]:
     """
     Update a user.
@@ -109,9 +137,11 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     # Use a transaction to ensure it's committed or rolled back
     async with db.begin():
         user = await get_user_by_email(db, email)
-        if not user:
-            return None
-        if not verify_password(password, user.hashed_password):
-            return None
         # Transaction will be committed when this block exits
+    if not user:
+        return None
+    # bcrypt is deliberately slow; verify in a worker thread so the event loop
+    # keeps serving other requests (and no transaction is held meanwhile)
+    if not await asyncio.to_thread(verify_password, password, user.hashed_password):
+        return None
     return user
@@ -0,0 +1,20 @@
+"""
+Helpers shared by the Alembic revision scripts. They live here rather than in
+alembic/versions because Alembic loads every module in that directory as a
+revision.
+"""
+from alembic import context, op
+from sqlalchemy.util import await_only
+
+
+def execute_script(script: str) -> None:
+    """
+    Run a multi-statement DDL script in one round trip. asyncpg prepares every
+    statement passed through SQLAlchemy and rejects multi-statement strings, so
+    the script goes to the driver connection directly (simple query protocol,
+    same transaction).
+    """
+    if context.is_offline_mode():
+        op.execute(script)
+        return
+    await_only(op.get_bind().connection.driver_connection.execute(script))
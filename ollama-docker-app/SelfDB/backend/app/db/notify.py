@@ -1,8 +1,11 @@
-from typing import Any, Dict, Optional, List, Union, Literal
+from typing import Any, Dict, Optional, List, Set, Tuple, Union, Literal
+from functools import lru_cache
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import inspect as sa_inspect, text
+import asyncio
 import json
 import logging
+import orjson
 import uuid
 from datetime import datetime, date, time
 from decimal import Decimal
@@ -28,12 +31,33 @@ class CustomJSONEncoder(json.JSONEncoder):
         # Let the base class handle other types or raise TypeError
         return super().default(obj)
 
+
+@lru_cache(maxsize=None)
+def _column_keys(model: type) -> Tuple[str, ...]:
+    """Column attribute names of a mapped class, in mapper order."""
+    return tuple(attr.key for attr in sa_inspect(model).column_attrs)
+
+def _notify_default(obj: Any) -> Any:
+    """
+    orjson fallback for notification payloads. orjson already writes UUIDs and
+    datetimes (in isoformat, like CustomJSONEncoder); this adds Decimals and
+    ORM rows. A row is sent as its loaded column attributes, read straight
+    from the instance dict: no lazy loads, and relationships that happen to
+    be loaded are not walked into the payload.
+    """
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, "_sa_instance_state"):
+        state = vars(obj)
+        return {k: state[k] for k in _column_keys(type(obj)) if k in state}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 async def emit_table_notification(
     db: AsyncSession,
     table_name: str,
     operation: Literal["INSERT", "UPDATE", "DELETE"],
-    data: Optional[Dict[str, Any]] = None,
-    old_data: Optional[Dict[str, Any]] = None
+    data: Optional[Any] = None,
+    old_data: Optional[Any] = None
 ) -> None:
     """
     Emit a notification for a table operation.
@@ -42,8 +66,8 @@ async def emit_table_notification(
         db: Database session
         table_name: Name of the table
         operation: One of "INSERT", "UPDATE", "DELETE"
-        data: New data for INSERT/UPDATE operations
-        old_data: Old data for UPDATE/DELETE operations
+        data: New data for INSERT/UPDATE operations, as a dict or an ORM row
+        old_data: Old data for UPDATE/DELETE operations, as a dict or an ORM row
     """
     try:
         payload: Dict[str, Any] = {
@@ -59,8 +83,7 @@ async def emit_table_notification(
             
         channel = f"{table_name}_changes"
         
-        # Use custom encoder to handle UUID objects
-        payload_json = json.dumps(payload, cls=CustomJSONEncoder)
+        payload_json = orjson.dumps(payload, default=_notify_default).decode()
         
         await db.execute(
             text(f"SELECT pg_notify(:channel, :payload)"),
@@ -71,6 +94,71 @@ async def emit_table_notification(
     except Exception as e:
         logger.error(f"Error emitting notification: {e}")
 
+# Bucket stats notifications from file uploads and deletes. Bursts of changes
+# to one bucket are coalesced: ids are collected for
+# BUCKET_UPDATE_DEBOUNCE_SECONDS and each distinct bucket is notified once,
+# in a short transaction of its own.
+BUCKET_UPDATE_DEBOUNCE_SECONDS = 0.5
+_pending_bucket_updates: Set[str] = set()
+_bucket_update_flush: Optional[asyncio.Task] = None
+
+async def enqueue_bucket_update(bucket_id: Union[uuid.UUID, str]) -> None:
+    """
+    Queue a buckets UPDATE notification ({"id": ..., "total_size_updated": True}).
+    
+    Never waits on the database. Meant for BackgroundTasks, which run after
+    the request's session has been committed, so the change is visible by
+    the time the notification goes out.
+    """
+    global _bucket_update_flush
+    _pending_bucket_updates.add(str(bucket_id))
+    if _bucket_update_flush is None or _bucket_update_flush.done():
+        _bucket_update_flush = asyncio.create_task(_flush_bucket_updates())
+
+async def _send_bucket_updates(bucket_ids: List[str]) -> None:
+    from .session import AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            for bucket_id in bucket_ids:
+                await emit_table_notification(
+                    session, "buckets", "UPDATE", {"id": bucket_id, "total_size_updated": True}
+                )
+            await session.commit()
+    except Exception as e:
+        logger.error(f"Error emitting bucket update notifications: {e}")
+
+async def _flush_bucket_updates() -> None:
+    # Ids queued while a batch is being sent are picked up by the next pass
+    while _pending_bucket_updates:
+        await asyncio.sleep(BUCKET_UPDATE_DEBOUNCE_SECONDS)
+        bucket_ids = list(_pending_bucket_updates)
+        _pending_bucket_updates.clear()
+        try:
+            await _send_bucket_updates(bucket_ids)
+        except asyncio.CancelledError:
+            # Hand the batch back so flush_bucket_updates still sends it
+            _pending_bucket_updates.update(bucket_ids)
+            raise
+
+async def flush_bucket_updates() -> None:
+    """
+    Send every queued bucket notification now instead of after the debounce
+    window (call on application shutdown).
+    """
+    global _bucket_update_flush
+    if _bucket_update_flush is not None and not _bucket_update_flush.done():
+        _bucket_update_flush.cancel()
+        try:
+            await _bucket_update_flush
+        except asyncio.CancelledError:
+            pass
+    _bucket_update_flush = None
+    if _pending_bucket_updates:
+        bucket_ids = list(_pending_bucket_updates)
+        _pending_bucket_updates.clear()
+        await _send_bucket_updates(bucket_ids)
+
 async def ensure_table_trigger_exists(
     db: AsyncSession,
     table_name: str,
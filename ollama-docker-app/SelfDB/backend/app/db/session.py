@@ -7,6 +7,13 @@ from ..core.config import settings # Import settings instance
 engine = create_async_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True, # Checks connection validity before use
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    # Prepared statements kept per connection by the asyncpg adapter, so hot
+    # queries skip parsing and planning (the default is 100)
+    connect_args={"prepared_statement_cache_size": 1024},
     echo=False # Set to True to log SQL queries (useful for debugging)
 )
 
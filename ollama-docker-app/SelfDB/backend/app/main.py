@@ -12,7 +12,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from .db.base import Base
 from .core.middleware import AnonKeyEnforcerMiddleware
 from .core.dynamic_cors import DynamicCORSMiddleware
-from .db.notify import create_trigger_for_all_tables
+from .db.notify import create_trigger_for_all_tables, flush_bucket_updates
+from .core.http import get_shared_client, close_shared_client
 
 # Configure logging
 logging.basicConfig(
@@ -113,7 +114,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type", "Authorization", "X-Next-Cursor"],
     max_age=86400,  # Cache preflight requests for 24 hours
 )
 # ----------------------------------------------------------------------------
@@ -175,8 +176,9 @@ async def startup_event():
 
     # Initialize Storage Service client
     try:
-        # No need to initialize the client here as it's created on-demand via dependency injection
-        logger.info("Storage Service client will be initialized on-demand")
+        # Open the shared connection pool; per-request clients borrow it
+        get_shared_client()
+        logger.info("Storage Service HTTP client initialized")
         logger.info("IMPORTANT: All buckets must be created through the admin dashboard")
         logger.info("No default buckets are created automatically")
 
@@ -190,3 +192,9 @@ async def shutdown_event():
     Clean up resources on shutdown.
     """
     logger.info("Shutting down SelfDB API...")
+
+    # Bucket stats notifications still inside their debounce window
+    await flush_bucket_updates()
+
+    # Release pooled connections to the storage service
+    await close_shared_client()
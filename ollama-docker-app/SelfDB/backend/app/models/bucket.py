@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import Column, String, Boolean, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -28,5 +28,10 @@ class Bucket(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Serves the newest-first, keyset-paginated bucket listing
+        Index("ix_buckets_created_at_id", created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f"<Bucket(id={self.id}, name='{self.name}', owner_id='{self.owner_id}')>"
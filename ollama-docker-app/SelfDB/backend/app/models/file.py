@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, DateTime, func
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
@@ -30,5 +30,11 @@ class File(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Serve the newest-first, keyset-paginated file listings
+        Index("ix_files_owner_id_created_at_id", owner_id, created_at.desc(), id.desc()),
+        Index("ix_files_bucket_id_created_at_id", bucket_id, created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f"<File(id={self.id}, filename='{self.filename}', owner_id='{self.owner_id}')>"
@@ -51,7 +51,10 @@ class Function(Base):
     runtime = Column(PgEnum(FunctionRuntime, name="function_runtime"), nullable=False, default=FunctionRuntime.deno)
 
     # Versioning
-    version_id = Column(UUID(as_uuid=True), ForeignKey("function_versions.id", ondelete="SET NULL"))
+    version_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("function_versions.id", ondelete="SET NULL", deferrable=True, initially="DEFERRED"),
+    )
     version_number = Column(Integer, nullable=False, default=1)
 
     # State
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, UUID4
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, UUID4
+from typing import Any, Mapping, Optional
 from datetime import datetime
 
 # Base Bucket schema with common attributes
@@ -38,3 +38,17 @@ class Bucket(BucketInDBBase):
 class BucketWithStats(Bucket):
     file_count: int = 0
     total_size: int = 0  # Total size in bytes
+
+    model_config = ConfigDict(from_attributes=True, extra="ignore", validate_assignment=False)
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "BucketWithStats":
+        """
+        Build from a trusted bucket-with-stats query row without validation.
+        The columns already have the schema's types; only the aggregates are
+        coerced, since SUM over a bigint comes back as a Decimal.
+        """
+        values = dict(row)
+        values["file_count"] = int(values["file_count"])
+        values["total_size"] = int(values["total_size"])
+        return cls.model_construct(**values)
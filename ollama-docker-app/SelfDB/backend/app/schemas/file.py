@@ -1,4 +1,4 @@
-from pydantic import BaseModel, UUID4
+from pydantic import BaseModel, ConfigDict, UUID4
 from typing import Optional
 from datetime import datetime
 
@@ -31,9 +31,7 @@ class FileInDBBase(FileBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
-    model_config = {
-        "from_attributes": True
-    }
+    model_config = ConfigDict(from_attributes=True)
 
 # Schema for returning file to client
 class File(FileInDBBase):
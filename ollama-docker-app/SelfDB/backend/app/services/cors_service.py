@@ -10,6 +10,17 @@ from ..models.cors_origin import CorsOrigin
 from ..models.user import User
 from ..schemas.cors import CorsOriginCreate, CorsOriginUpdate
 
+# Accepted origin formats, compiled once as a single pattern:
+# protocol://host[:port] where host is localhost, an IPv4 address, or a
+# domain with at least one dot (TLD)
+_ORIGIN_RE = re.compile(
+    r'^https?://'
+    r'(?:localhost'
+    r'|(?:\d{1,3}\.){3}\d{1,3}'
+    r'|[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)+?)'
+    r'(?::[0-9]{1,5})?$'
+)
+
 
 class CorsService:
     """Service for managing CORS origins."""
@@ -27,22 +38,7 @@ class CorsService:
         """
         if not origin:
             return False
-            
-        # Allow localhost variations (with or without port)
-        localhost_pattern = r'^https?://localhost(:[0-9]{1,5})?$'
-        if re.match(localhost_pattern, origin):
-            return True
-        
-        # Allow IP addresses (IPv4)
-        ip_pattern = r'^https?://(\d{1,3}\.){3}\d{1,3}(:[0-9]{1,5})?$'
-        if re.match(ip_pattern, origin):
-            return True
-            
-        # For regular domains, require at least one dot (TLD)
-        # Pattern: protocol://domain.tld[:port]
-        domain_pattern = r'^https?://[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9-]{0,61}[a-zA-Z0-9])?)+?(:[0-9]{1,5})?$'
-        
-        return bool(re.match(domain_pattern, origin))
+        return _ORIGIN_RE.match(origin) is not None
 
     @staticmethod
     async def list_origins(db: AsyncSession, active_only: bool = True) -> List[CorsOrigin]:
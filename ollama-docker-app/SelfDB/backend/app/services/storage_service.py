@@ -14,6 +14,7 @@ import os
 from urllib.parse import urljoin
 
 from ..core.config import settings
+from ..core.http import get_shared_client
 
 logger = logging.getLogger(__name__)
 
@@ -21,15 +22,22 @@ class StorageServiceClient:
     """
     Client for interacting with the storage service.
     This replaces the MinIO client with HTTP requests to our custom storage service.
+
+    The underlying httpx client is borrowed, not owned: it defaults to the
+    shared storage client (core.http.get_shared_client) and is never closed by
+    this class.
     """
-    def __init__(self, base_url: str, token: Optional[str] = None, anon_key: Optional[str] = None):
+    def __init__(
+        self,
+        base_url: str,
+        token: Optional[str] = None,
+        anon_key: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.token = token
         self.anon_key = anon_key
-        self.client = httpx.AsyncClient(timeout=60.0)  # Longer timeout for file uploads/downloads
-    
-    async def close(self):
-        await self.client.aclose()
+        self.client = client if client is not None else get_shared_client()
     
     def _get_headers(self) -> Dict[str, str]:
         """Get headers with authentication if available"""
@@ -120,9 +128,10 @@ class StorageServiceClient:
         """Upload a file to a bucket"""
         url = f"{self.base_url}/files/upload/{bucket_name}"
         
-        # Prepare file for upload
-        content = await file.read()
-        files = {"file": (file.filename, content, file.content_type)}
+        # Prepare file for upload. The underlying spooled file is streamed by
+        # httpx in chunks rather than read into memory up front.
+        await file.seek(0)
+        files = {"file": (file.filename, file.file, file.content_type)}
         
         try:
             response = await self.client.post(
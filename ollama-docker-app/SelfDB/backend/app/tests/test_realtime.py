@@ -9,6 +9,24 @@ from unittest.mock import MagicMock, AsyncMock, patch
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def expand_database_changes(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split a database_change_batch message into one database_change message per event"""
+    if message.get("type") != "database_change_batch":
+        return [message]
+    return [
+        {"type": "database_change", "subscription_id": message["subscription_id"], "data": event}
+        for event in message["events"]
+    ]
+
+class MockWebSocket:
+    """Mock WebSocket that records the text frames sent to it"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, message: str):
+        self.sent.append(json.loads(message))
+
 class MockWebSocketManager:
     """Mock WebSocket connection manager"""
     
@@ -21,7 +39,7 @@ class MockWebSocketManager:
         """Mock broadcasting a message to a user"""
         if user_id not in self.messages:
             self.messages[user_id] = []
-        self.messages[user_id].append(json.loads(message))
+        self.messages[user_id].extend(expand_database_changes(json.loads(message)))
         logger.info(f"Broadcast to user {user_id}: {message}")
     
     def add_subscription(self, user_id: str, subscription_id: str, data: Dict[str, Any]):
@@ -221,6 +239,44 @@ async def test_notification_handler():
     
     logger.info("Notification handler test passed!")
 
+@pytest.mark.asyncio
+async def test_burst_notifications_reach_client():
+    """Test that notifications arriving within one batching window all reach the client"""
+    from app.apis.endpoints import realtime
+
+    manager = realtime.ConnectionManager()
+    websocket = MockWebSocket()
+    with patch.object(realtime, "manager", manager), \
+            patch.object(realtime, "_notification_queue", asyncio.Queue()):
+        await manager.connect(websocket, "user1")
+        manager.add_subscription("user1", "test_table_changes", {})
+
+        dispatcher = asyncio.create_task(realtime._dispatch_notifications())
+        try:
+            # Both land in the queue before the dispatcher's window closes
+            for row_id in (1, 2):
+                await realtime.handle_database_notification(
+                    None, 0, "test_table_changes",
+                    json.dumps({"table": "test_table", "operation": "INSERT", "data": {"id": row_id}})
+                )
+            await asyncio.sleep(realtime.NOTIFY_BATCH_WINDOW_SECONDS * 10)
+        finally:
+            dispatcher.cancel()
+
+    assert len(websocket.sent) == 1, "Expected the burst to be sent as one message"
+    assert websocket.sent[0]["type"] == "database_change_batch", "Incorrect message type"
+
+    events = [
+        message
+        for sent in websocket.sent
+        for message in expand_database_changes(sent)
+    ]
+    assert [event["subscription_id"] for event in events] == ["test_table_changes"] * 2
+    assert [event["data"]["data"]["id"] for event in events] == [1, 2], "Not every change reached the client"
+
+    logger.info("Burst notification test passed!")
+
 if __name__ == "__main__":
     asyncio.run(test_emit_table_notification())
     asyncio.run(test_notification_handler())
+    asyncio.run(test_burst_notifications_reach_client())
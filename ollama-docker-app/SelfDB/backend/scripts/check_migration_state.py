@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Script to check whether the database is already at the latest migration.
+Exits with status 0 when every Alembic head is recorded in alembic_version,
+so init.sh can skip `alembic upgrade` (and loading every migration module)
+on warm starts. Exits with status 2 on a fresh database (no alembic_version
+table, or an empty one), where init.sh seeds before the deferred index
+revisions, and with status 1 when an existing database still needs
+migrations.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+from sqlalchemy import text
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.db.session import AsyncSessionLocal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = Path(__file__).resolve().parents[1] / "alembic" / "versions"
+
+_REVISION_RE = re.compile(r"^revision\s*=\s*['\"]([^'\"]+)['\"]", re.MULTILINE)
+_DOWN_REVISION_RE = re.compile(r"^down_revision\s*=\s*(.+)$", re.MULTILINE)
+_QUOTED_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+
+
+def get_head_revisions() -> set:
+    """
+    Read the head revisions straight from the migration files.
+    The files are scanned as text rather than imported, and are read from
+    disk on every start so the check can never go stale against a mounted
+    alembic/ directory.
+    """
+    revisions = set()
+    parents = set()
+    for path in VERSIONS_DIR.glob("*.py"):
+        source = path.read_text()
+        revision = _REVISION_RE.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down_revision = _DOWN_REVISION_RE.search(source)
+        if down_revision:
+            parents.update(_QUOTED_RE.findall(down_revision.group(1)))
+    return revisions - parents
+
+
+async def get_applied_revisions() -> set:
+    """
+    Return the revisions recorded in alembic_version (empty on a fresh database).
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("SELECT to_regclass('public.alembic_version') IS NOT NULL"))
+        if not result.scalar():
+            return set()
+        result = await db.execute(text("SELECT version_num FROM alembic_version"))
+        return {row[0] for row in result}
+
+
+async def main():
+    """Main function"""
+    heads = get_head_revisions()
+    try:
+        applied = await get_applied_revisions()
+    except Exception as e:
+        logger.warning(f"Could not read migration state, migrations will run: {e}")
+        sys.exit(1)
+
+    if heads and applied == heads:
+        logger.info(f"Database is at the latest migration ({', '.join(sorted(heads))})")
+        sys.exit(0)
+
+    if not applied:
+        logger.info(f"Fresh database, latest migration is {sorted(heads)}")
+        sys.exit(2)
+
+    logger.info(f"Database at {sorted(applied)}, latest is {sorted(heads)}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,13 +3,16 @@
 Script to fix CORS origins migration state issue.
 This script will mark the add_cors_origins_table migration as completed 
 if the table already exists in the database.
+It also collapses the two alembic_version rows left by the old branched
+migration graph, now that add_cors_origins_table precedes
+change_file_size_to_biginteger.
 """
 
 import asyncio
 import logging
 import os
 import sys
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -19,6 +22,14 @@ from app.db.session import AsyncSessionLocal
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Revisions that come after add_cors_origins_table in the migration chain
+LATER_REVISIONS = (
+    'change_file_size_to_biginteger',
+    'create_indexes_after_seed',
+    'add_buckets_created_at_index',
+    'add_files_created_at_indexes',
+)
+
 
 async def fix_cors_migration():
     """
@@ -41,7 +52,25 @@ async def fix_cors_migration():
                 )
                 migration_exists = result.fetchone()
                 
-                if not migration_exists:
+                result = await db.execute(
+                    text("SELECT version_num FROM alembic_version WHERE version_num IN :revisions").bindparams(
+                        bindparam("revisions", expanding=True)
+                    ),
+                    {"revisions": list(LATER_REVISIONS)}
+                )
+                later_version = result.scalar()
+
+                if migration_exists and later_version:
+                    # Left over from when the two revisions were separate
+                    # branches; alembic refuses to upgrade with both rows
+                    logger.info(f"Removing redundant add_cors_origins_table row, {later_version} already includes it")
+                    await db.execute(
+                        text("DELETE FROM alembic_version WHERE version_num = 'add_cors_origins_table'")
+                    )
+                    await db.commit()
+                elif later_version:
+                    logger.info(f"Migration add_cors_origins_table is already included in {later_version}")
+                elif not migration_exists:
                     logger.info("Marking add_cors_origins_table migration as completed...")
                     
                     # Get current migration state
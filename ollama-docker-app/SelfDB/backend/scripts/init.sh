@@ -32,12 +32,32 @@ while True:
 echo "Checking and fixing migration state..."
 cd /app && PYTHONPATH=/app python scripts/fix_cors_migration.py
 
-# Run migrations
+# On a fresh database, migrations stop at this revision for the initial data
+# load; the remaining revisions (deferred index builds such as
+# create_indexes_after_seed) run after it. Existing databases are always
+# upgraded to head before seeding, since they may already be past it.
+PRE_SEED_REVISION="change_file_size_to_biginteger"
+
+# Run migrations, unless the database is already at the latest revision
 echo "Running database migrations..."
-cd /app && PYTHONPATH=/app alembic upgrade heads
+MIGRATION_STATE=0
+cd /app && PYTHONPATH=/app python scripts/check_migration_state.py || MIGRATION_STATE=$?
+if [ "$MIGRATION_STATE" -eq 0 ]; then
+    echo "Database is up to date, skipping migrations"
+elif [ "$MIGRATION_STATE" -eq 2 ]; then
+    cd /app && PYTHONPATH=/app alembic upgrade "$PRE_SEED_REVISION"
+else
+    cd /app && PYTHONPATH=/app alembic upgrade head
+fi
 
 # Create initial data
 echo "Creating initial data..."
 cd /app && PYTHONPATH=/app python -m app.initial_data
 
+# Finish migrations on a fresh database now that the initial data is loaded
+if [ "$MIGRATION_STATE" -eq 2 ]; then
+    echo "Running post-seed migrations..."
+    cd /app && PYTHONPATH=/app alembic upgrade head
+fi
+
 echo "Initialization complete!"
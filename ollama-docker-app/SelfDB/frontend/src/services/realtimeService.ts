@@ -10,6 +10,7 @@ interface WebSocketMessage {
   subscription_id?: string;
   user_id?: string;
   data?: any;
+  events?: any[];
   token?: string;
 }
 
@@ -80,6 +81,10 @@ class RealtimeService {
           console.log('Received database change for subscription:', message.subscription_id, message.data);
           const listeners = this.listeners.get(message.subscription_id);
           listeners?.forEach(callback => callback(message.data));
+        } else if (message.type === 'database_change_batch' && message.subscription_id && this.listeners.has(message.subscription_id)) {
+          // Several changes delivered together, in the order they happened
+          const listeners = this.listeners.get(message.subscription_id);
+          message.events?.forEach(data => listeners?.forEach(callback => callback(data)));
         } else if (message.subscription_id && this.listeners.has(message.subscription_id)) {
           // Notify listeners for this subscription
           const listeners = this.listeners.get(message.subscription_id);
@@ -267,6 +267,19 @@ async def subscribe_to_changes():
         except Exception as e:
             write_to_file(f"❌ Subscription error for {sub['subscription_id']}: {str(e)}")
 
+def expand_database_changes(message: Dict[str, Any]) -> list:
+    """
+    Split a "database_change_batch" message (several changes the backend sent
+    together) into one "database_change" message per event, in order. Any
+    other message is returned as the only item.
+    """
+    if message.get("type") != "database_change_batch":
+        return [message]
+    return [
+        {"type": "database_change", "subscription_id": message.get("subscription_id"), "data": event}
+        for event in message.get("events", [])
+    ]
+
 async def websocket_listener():
     """Listen for WebSocket notifications"""
     notification_queue = queue.Queue()
@@ -277,21 +290,20 @@ async def websocket_listener():
                 message = await asyncio.wait_for(
                     state.websocket_connection.recv(), timeout=1.0
                 )
-                notification = json.loads(message)
-                
-                # Store notification with timestamp
-                timestamped_notification = {
-                    "timestamp": datetime.now().isoformat(),
-                    "notification": notification
-                }
-                state.websocket_notifications.append(timestamped_notification)
-                notification_queue.put(timestamped_notification)
-                
-                # Log real-time notifications
-                if notification.get("type") == "database_change":
-                    sub_id = notification.get("subscription_id")
-                    data = notification.get("data", {})
-                    write_to_file(f"🔔 Real-time notification: {sub_id} - {data}")
+                for notification in expand_database_changes(json.loads(message)):
+                    # Store notification with timestamp
+                    timestamped_notification = {
+                        "timestamp": datetime.now().isoformat(),
+                        "notification": notification
+                    }
+                    state.websocket_notifications.append(timestamped_notification)
+                    notification_queue.put(timestamped_notification)
+
+                    # Log real-time notifications
+                    if notification.get("type") == "database_change":
+                        sub_id = notification.get("subscription_id")
+                        data = notification.get("data", {})
+                        write_to_file(f"🔔 Real-time notification: {sub_id} - {data}")
                     
             except asyncio.TimeoutError:
                 continue
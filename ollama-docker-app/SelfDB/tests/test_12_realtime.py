@@ -99,33 +99,33 @@ async def test_realtime_table_subscription():
             while time.time() < end_time and len(received_notifications) < 3:
                 try:
                     msg = await asyncio.wait_for(ws.recv(), timeout=2.0)
-                    data = json.loads(msg)
-                    if data.get("type") == "database_change" and data.get("subscription_id") == subscription_id:
-                        operation = data.get('data', {}).get('operation', 'UNKNOWN')
-                        row_data = data.get('data', {}).get('data', {})
-                        old_data = data.get('data', {}).get('old_data', {})
+                    for data in helpers.expand_database_changes(json.loads(msg)):
+                        if data.get("type") == "database_change" and data.get("subscription_id") == subscription_id:
+                            operation = data.get('data', {}).get('operation', 'UNKNOWN')
+                            row_data = data.get('data', {}).get('data', {})
+                            old_data = data.get('data', {}).get('old_data', {})
                         
-                        if operation == 'DELETE' and old_data:
-                            row_data_id = old_data.get('id') if isinstance(old_data, dict) else None
-                        else:
-                            row_data_id = row_data.get('id') if isinstance(row_data, dict) else None
+                            if operation == 'DELETE' and old_data:
+                                row_data_id = old_data.get('id') if isinstance(old_data, dict) else None
+                            else:
+                                row_data_id = row_data.get('id') if isinstance(row_data, dict) else None
                         
-                        helpers.write_to_file(f"WS-RTTest: Notification received - Operation: {operation}, Row ID: {row_data_id}, Our Row ID: {row_id}")
+                            helpers.write_to_file(f"WS-RTTest: Notification received - Operation: {operation}, Row ID: {row_data_id}, Our Row ID: {row_id}")
                         
-                        if row_data_id == row_id or (operation == 'INSERT' and not row_id):
-                            operation_key = f"{operation}:{row_data_id or 'new'}"
-                            if operation_key not in seen_operations:
-                                seen_operations.add(operation_key)
-                                received_notifications.append(data)
-                                helpers.write_to_file(f"WS-RTTest: ✓ Counted notification: {operation} for row {row_data_id}")
+                            if row_data_id == row_id or (operation == 'INSERT' and not row_id):
+                                operation_key = f"{operation}:{row_data_id or 'new'}"
+                                if operation_key not in seen_operations:
+                                    seen_operations.add(operation_key)
+                                    received_notifications.append(data)
+                                    helpers.write_to_file(f"WS-RTTest: ✓ Counted notification: {operation} for row {row_data_id}")
                                 
-                                if operation == 'INSERT' and not row_id and row_data_id:
-                                    row_id = row_data_id
-                                    helpers.write_to_file(f"WS-RTTest: Captured row ID from notification: {row_id}")
+                                    if operation == 'INSERT' and not row_id and row_data_id:
+                                        row_id = row_data_id
+                                        helpers.write_to_file(f"WS-RTTest: Captured row ID from notification: {row_id}")
+                                else:
+                                    helpers.write_to_file(f"WS-RTTest: Skipped duplicate: {operation_key}")
                             else:
-                                helpers.write_to_file(f"WS-RTTest: Skipped duplicate: {operation_key}")
-                        else:
-                            helpers.write_to_file(f"WS-RTTest: Skipped notification for different row: {row_data_id} != {row_id}")
+                                helpers.write_to_file(f"WS-RTTest: Skipped notification for different row: {row_data_id} != {row_id}")
                 except asyncio.TimeoutError:
                     if len(received_notifications) >= 3:
                         helpers.write_to_file("WS-RTTest: Collected all expected notifications")
@@ -176,9 +176,91 @@ async def test_realtime_table_subscription():
         cleanup_res = requests.delete(f"{config.BACKEND_URL}/tables/{table_name}", headers=user_headers)
         helpers.write_to_file(f"WS-RTTest: Cleanup status: {cleanup_res.status_code}")
 
+async def test_realtime_batched_changes():
+    """Test that changes committed together (and so batched by the backend) all reach the client."""
+    helpers.print_test_header("Real-time Batched Changes")
+
+    if not state.access_token:
+        helpers.write_to_file("❌ Skipping real-time batched changes test - no user token available.")
+        state.test_summary["total"] += 1
+        state.test_summary["failed"] += 1
+        state.test_summary["errors"].append({"description": "Real-time batch: No user token", "status_code": "N/A", "url": "N/A"})
+        return
+
+    user_headers = helpers.get_headers(auth=True)
+    table_name = f"rt_batch_{str(int(time.time()))}"
+
+    # 1. Ensure the table exists
+    table_payload = {
+        "name": table_name,
+        "description": "Realtime batching test table",
+        "if_not_exists": True,
+        "columns": [
+            {"name": "id", "type": "UUID", "nullable": False, "primary_key": True, "default": "gen_random_uuid()"},
+            {"name": "message", "type": "TEXT", "nullable": False}
+        ]
+    }
+    r = requests.post(f"{config.BACKEND_URL}/tables", headers={**user_headers, "Content-Type": "application/json"}, json=table_payload)
+    helpers.print_response(r, f"Ensure '{table_name}' table exists for real-time batch test")
+
+    ws_url = config.BACKEND_URL.replace("http://", "ws://").replace("https://", "wss://") + f"/realtime/ws?apikey={config.API_KEY}"
+    received_messages = set()
+
+    try:
+        async with websockets.connect(ws_url) as ws:
+            await ws.send(json.dumps({"type": "authenticate", "token": state.access_token}))
+            helpers.write_to_file(f"WS-RTBatch: Authenticated: {json.loads(await ws.recv())}")
+
+            subscription_id = f"{table_name}_changes"
+            await ws.send(json.dumps({"type": "subscribe", "subscription_id": subscription_id}))
+            helpers.write_to_file(f"WS-RTBatch: Subscribed: {json.loads(await ws.recv())}")
+
+            # 2. Insert two rows in one statement: both row triggers notify in
+            # the same commit, well inside the backend's 10 ms batching window
+            insert_res = requests.post(
+                f"{config.BACKEND_URL}/sql/query",
+                headers={**user_headers, "Content-Type": "application/json"},
+                json={"query": f"INSERT INTO \"{table_name}\" (message) VALUES ('first'), ('second');"}
+            )
+            helpers.write_to_file(f"WS-RTBatch: Inserted two rows - Status: {insert_res.status_code}")
+
+            # 3. Collect notifications
+            end_time = time.time() + 10
+            while time.time() < end_time and len(received_messages) < 2:
+                try:
+                    msg = await asyncio.wait_for(ws.recv(), timeout=2.0)
+                except asyncio.TimeoutError:
+                    continue
+                raw = json.loads(msg)
+                helpers.write_to_file(f"WS-RTBatch: Message received - Type: {raw.get('type')}")
+                for data in helpers.expand_database_changes(raw):
+                    if data.get("type") == "database_change" and data.get("subscription_id") == subscription_id:
+                        change = data.get("data", {})
+                        if change.get("operation") == "INSERT" and isinstance(change.get("data"), dict):
+                            received_messages.add(change["data"].get("message"))
+    except Exception as e:
+        helpers.write_to_file(f"❌ An error occurred during the real-time batch test: {e}")
+
+    # 4. Verify both changes arrived
+    test_desc = "Real-time: Both changes of one commit received"
+    state.test_summary["total"] += 1
+    if received_messages == {"first", "second"}:
+        state.test_summary["passed"] += 1
+        state.test_summary["passed_tests"].append(test_desc)
+        helpers.write_to_file(f"✅ {test_desc}")
+    else:
+        state.test_summary["failed"] += 1
+        state.test_summary["errors"].append({"description": test_desc, "status_code": f"Got {sorted(received_messages)}", "url": "WebSocket"})
+        helpers.write_to_file(f"❌ {test_desc} - Got {sorted(received_messages)}")
+
+    if state.access_token:
+        cleanup_res = requests.delete(f"{config.BACKEND_URL}/tables/{table_name}", headers=user_headers)
+        helpers.write_to_file(f"WS-RTBatch: Cleanup status: {cleanup_res.status_code}")
+
 def run():
     """Run real-time tests"""
     asyncio.run(test_realtime_table_subscription())
+    asyncio.run(test_realtime_batched_changes())
 
 if __name__ == "__main__":
     # When run independently